@@ -1,15 +1,23 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 import os
 import sys
+import gzip
+import json
+import hashlib
+import threading
 
 # Add backend directory to path for imports
 sys.path.insert(0, os.path.dirname(__file__))
 
-from youtube_service import generate_notes_from_youtube
-from gemini_service import generate_notes_from_audio
-from storage import add_note, get_all_notes, get_note_by_id
-from audio_processor import save_audio_file, cleanup_file, convert_to_mp3
+from youtube_service import (
+    generate_notes_from_youtube, stream_notes_from_youtube, generate_notes_bulk, expand_playlist,
+    transcript_cache, notes_cache, BULK_WORKERS, MAX_BULK_VIDEOS
+)
+from gemini_service import generate_notes_from_audio, audio_notes_cache, gemini_uploads
+from storage import add_note, list_notes, get_note_by_id, search_notes, get_store_version
+from audio_processor import save_audio_file, cleanup_scratch, ingest_audio, filename_for_mimetype, start_janitor
+from jobs import JobQueue, current_job_id, report_progress
 
 app = Flask(__name__, static_folder=None)
 CORS(app)  # Enable CORS for frontend
@@ -17,6 +25,137 @@ CORS(app)  # Enable CORS for frontend
 # Serve frontend files
 FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'frontend')
 
+# Upper bound for ?limit= on note listings and searches
+MAX_PAGE_SIZE = 200
+
+# JSON responses smaller than this aren't worth gzipping
+GZIP_MIN_SIZE = 1024
+
+# Background threads per process for note generation requested with async
+JOB_WORKERS = 4
+job_queue = None
+_background_lock = threading.Lock()
+
+@app.before_request
+def start_background_services():
+    """
+    Start this process's job queue and upload janitor with its first request
+
+    Not at import time: the chapter pool's spawned workers re-run this
+    module (as __mp_main__ under `python app.py`) and must not start their own.
+    """
+    global job_queue
+    if job_queue is not None:
+        return
+    with _background_lock:
+        if job_queue is None:
+            # Removes uploads orphaned by crashes and keeps uploads/ under its disk quota
+            start_janitor()
+            job_queue = JobQueue(workers=JOB_WORKERS)
+
+def client_has_etag(etag):
+    """True if the request's If-None-Match already covers this entity tag"""
+    # The gzipped representation carries a '-gzip' suffixed tag, see compress_response
+    return request.if_none_match.contains(etag) or request.if_none_match.contains(etag + '-gzip')
+
+def not_modified(etag):
+    """Empty 304 response for a representation the client already holds"""
+    response = app.response_class(status=304)
+    if request.if_none_match.contains(etag + '-gzip'):
+        etag += '-gzip'
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Gzip large JSON responses for clients that accept it"""
+    if response.mimetype != 'application/json' or response.is_streamed or 'Content-Encoding' in response.headers:
+        return response
+    # Small bodies are never compressed, so only larger ones vary by coding
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+    response.vary.add('Accept-Encoding')
+    if request.accept_encodings.quality('gzip') <= 0:
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = 'gzip'
+
+    # A strong validator has to differ between content codings
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(etag + '-gzip', weak)
+    return response
+
+def save_youtube_note(youtube_url, video_id, video_title, notes_content, detail_level, format_type):
+    """Store generated YouTube notes in history and return the saved note"""
+    return add_note(
+        note_type='youtube',
+        title=f"YouTube Video: {video_title}",
+        content=notes_content,
+        metadata={
+            'url': youtube_url,
+            'video_id': video_id,
+            'video_title': video_title,
+            'detail_level': detail_level,
+            'format_type': format_type
+        }
+    )
+
+def wants_async(data=None):
+    """True if the client asked for a background job (?async=1, or an async field in the body)"""
+    value = request.args.get('async')
+    if value is None and data is not None:
+        value = data.get('async')
+    return str(value).lower() in ('1', 'true', 'yes')
+
+def job_accepted(job_id):
+    """202 response pointing the client at its job"""
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f"/api/jobs/{job_id}"
+    }), 202
+
+def youtube_note_job(youtube_url, detail_level, format_type):
+    """Background job body: generate and save notes for one video"""
+    notes_content, video_title, video_id = generate_notes_from_youtube(youtube_url, detail_level, format_type)
+    note = save_youtube_note(youtube_url, video_id, video_title, notes_content, detail_level, format_type)
+    return {'note': note}
+
+def bulk_youtube_job(urls, detail_level, format_type, workers):
+    """
+    Background job body: generate notes for many videos, saving each one as
+    soon as it is done and publishing per-video status as job progress
+    """
+    job_id = current_job_id()
+    finished = []
+    lock = threading.Lock()
+    
+    def save(result):
+        if result['status'] == 'ok':
+            try:
+                note = save_youtube_note(
+                    result['url'], result['video_id'], result['video_title'], result.pop('notes'),
+                    detail_level, format_type
+                )
+                result['note_id'] = note['id']
+            except Exception as e:
+                result.update(status='error', error=f"Could not save note: {e}")
+        with lock:
+            finished.append(result)
+            report_progress(job_id, {'total': len(urls), 'finished': len(finished), 'videos': finished})
+    
+    results, summary = generate_notes_bulk(urls, detail_level, format_type, workers, on_result=save)
+    return {'success': summary['failed'] == 0, 'summary': summary, 'videos': results}
+
+def sse_event(event, data):
+    """One Server-Sent Events message carrying a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @app.route('/api/generate-notes/youtube', methods=['POST'])
 def generate_youtube_notes():
     """Generate notes from YouTube video URL"""
@@ -29,22 +168,14 @@ def generate_youtube_notes():
         if not youtube_url:
             return jsonify({'error': 'YouTube URL is required'}), 400
         
+        if wants_async(data):
+            return job_accepted(job_queue.submit('youtube', youtube_note_job, youtube_url, detail_level, format_type))
+        
         # Generate notes using transcript extraction
         notes_content, video_title, video_id = generate_notes_from_youtube(youtube_url, detail_level, format_type)
         
         # Save to storage
-        note = add_note(
-            note_type='youtube',
-            title=f"YouTube Video: {video_title}",
-            content=notes_content,
-            metadata={
-                'url': youtube_url,
-                'video_id': video_id,
-                'video_title': video_title,
-                'detail_level': detail_level,
-                'format_type': format_type
-            }
-        )
+        note = save_youtube_note(youtube_url, video_id, video_title, notes_content, detail_level, format_type)
         
         return jsonify({
             'success': True,
@@ -54,82 +185,191 @@ def generate_youtube_notes():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/generate-notes/youtube/stream', methods=['GET', 'POST'])
+def stream_youtube_notes():
+    """
+    Generate notes from YouTube video URL as a Server-Sent Events stream
+
+    Takes the same fields as /api/generate-notes/youtube, as a JSON body or,
+    for EventSource clients, as query params. Events, in order:
+        progress  {stage}: a pipeline stage is starting
+        video     {title, duration}: once the video is known
+        section   {markdown}: the next piece of the notes, to append
+        note      {note}: the saved note, after the last section
+        error     {error}: the pipeline failed; nothing is saved
+    """
+    data = request.get_json(silent=True) or request.args
+    youtube_url = data.get('url')
+    detail_level = data.get('detail_level', 'medium')
+    format_type = data.get('format_type', 'bullet')
+    
+    if not youtube_url:
+        return jsonify({'error': 'YouTube URL is required'}), 400
+    
+    def events():
+        try:
+            for kind, payload in stream_notes_from_youtube(youtube_url, detail_level, format_type):
+                if kind == 'progress':
+                    yield sse_event('progress', {'stage': payload})
+                elif kind == 'video':
+                    yield sse_event('video', payload)
+                elif kind == 'section':
+                    yield sse_event('section', {'markdown': payload})
+                elif kind == 'done':
+                    # Persisted once, only after the whole note was generated
+                    note = save_youtube_note(
+                        youtube_url, payload['video_id'], payload['video_title'], payload['notes'],
+                        detail_level, format_type
+                    )
+                    yield sse_event('note', {'note': note})
+        except Exception as e:
+            yield sse_event('error', {'error': str(e)})
+    
+    return app.response_class(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        # Keep proxies from buffering the stream
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/generate-notes/youtube/bulk', methods=['POST'])
+def generate_bulk_youtube_notes():
+    """
+    Generate notes for a playlist or a list of YouTube URLs
+
+    JSON body: either playlist_url or urls (a list), plus the usual
+    detail_level and format_type, and optionally workers (parallel videos,
+    capped server-side). Runs as a background job (202 with its job_id):
+    each video's note is saved as soon as it is done, the job's progress
+    lists every finished video, and failures are reported per video
+    without failing the job.
+    """
+    try:
+        data = request.json or {}
+        detail_level = data.get('detail_level', 'medium')
+        format_type = data.get('format_type', 'bullet')
+        workers = data.get('workers', BULK_WORKERS)
+        
+        if data.get('playlist_url'):
+            urls = expand_playlist(data['playlist_url'])
+        else:
+            urls = data.get('urls')
+            if not isinstance(urls, list) or not all(isinstance(url, str) and url for url in urls):
+                return jsonify({'error': 'playlist_url or a list of urls is required'}), 400
+        if not urls:
+            return jsonify({'error': 'No videos to process'}), 400
+        if len(urls) > MAX_BULK_VIDEOS:
+            return jsonify({'error': f'At most {MAX_BULK_VIDEOS} videos per request'}), 400
+        if not isinstance(workers, int) or workers < 1:
+            return jsonify({'error': 'workers must be a positive integer'}), 400
+        
+        urls = list(dict.fromkeys(urls))
+        return job_accepted(job_queue.submit('youtube-bulk', bulk_youtube_job, urls, detail_level, format_type, workers))
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def process_audio_note(audio_path, filename, detail_level, format_type):
+    """Generate notes with Gemini from an ingested recording and store them; always removes the recording"""
+    try:
+        # Generate notes using Gemini
+        print("Calling generate_notes_from_audio...")
+        notes_content = generate_notes_from_audio(audio_path, detail_level, format_type)
+        print(f"Notes generated, length: {len(notes_content)}")
+        
+        # Save to storage
+        note = add_note(
+            note_type='meet',
+            title=f"Google Meet Recording: {filename}",
+            content=notes_content,
+            metadata={
+                'filename': filename,
+                'detail_level': detail_level,
+                'format_type': format_type
+            }
+        )
+        print("Note saved to storage")
+        return note
+    finally:
+        # Clean up the upload's scratch directory
+        try:
+            cleanup_scratch(audio_path)
+        except Exception:
+            pass
+
+def audio_note_job(audio_path, filename, detail_level, format_type):
+    """Background job body: process_audio_note, with the note as the job result"""
+    return {'note': process_audio_note(audio_path, filename, detail_level, format_type)}
+
 @app.route('/api/generate-notes/audio', methods=['POST'])
 def generate_audio_notes():
-    """Generate notes from uploaded audio file"""
+    """
+    Generate notes from an audio recording
+    
+    Accepts either a multipart form with an 'audio' file, or the raw
+    recording as the request body with an audio/* Content-Type (options and
+    an optional filename in the query string). A raw body is transcoded
+    while it is still being uploaded.
+    """
     try:
         print("=== Audio Notes Request Received ===")
-        print(f"Files: {list(request.files.keys())}")
-        print(f"Form data: {dict(request.form)}")
-        
-        if 'audio' not in request.files:
-            print("ERROR: No audio file in request")
-            return jsonify({'error': 'No audio file provided'}), 400
-        
-        audio_file = request.files['audio']
-        detail_level = request.form.get('detail_level', 'medium')
-        format_type = request.form.get('format_type', 'bullet')
         
-        print(f"Audio file: {audio_file.filename}, size: {audio_file.content_length}")
+        if request.mimetype.startswith(('audio/', 'video/')):
+            # Raw body: never touch request.form/files, which would read it
+            options = request.args
+            filename = request.args.get('filename') or filename_for_mimetype(request.mimetype)
+            stream = request.stream
+            print(f"Raw audio body: {request.mimetype}, size: {request.content_length}")
+        else:
+            print(f"Files: {list(request.files.keys())}")
+            print(f"Form data: {dict(request.form)}")
+            
+            if 'audio' not in request.files:
+                print("ERROR: No audio file in request")
+                return jsonify({'error': 'No audio file provided'}), 400
+            
+            audio_file = request.files['audio']
+            options = request.form
+            filename = audio_file.filename
+            stream = audio_file.stream
+            print(f"Audio file: {audio_file.filename}, size: {audio_file.content_length}")
+            
+            if audio_file.filename == '':
+                print("ERROR: Empty filename")
+                return jsonify({'error': 'No file selected'}), 400
         
-        if audio_file.filename == '':
-            print("ERROR: Empty filename")
-            return jsonify({'error': 'No file selected'}), 400
+        detail_level = options.get('detail_level', 'medium')
+        format_type = options.get('format_type', 'bullet')
         
-        # Save audio file temporarily
+        # Get audio Gemini accepts (transcodes webm/webm;opus etc.)
         try:
-            audio_path = save_audio_file(audio_file)
-            print(f"Audio saved to: {audio_path}")
+            print("Preparing audio for Gemini...")
+            audio_path = ingest_audio(stream, filename)
+            print(f"Audio ready: {audio_path}")
+        except ValueError as e:
+            print(f"ERROR reading audio: {str(e)}")
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             print(f"ERROR saving file: {str(e)}")
             return jsonify({'error': f'Error saving audio file: {str(e)}'}), 500
         
-        mp3_path = None
+        if wants_async(options):
+            # The job owns the audio from here on, including its cleanup
+            return job_accepted(job_queue.submit(
+                'audio', audio_note_job, audio_path, filename, detail_level, format_type
+            ))
+        
         try:
-            # Convert to MP3 for Gemini (handles webm/webm;opus etc.)
-            print("Converting audio to MP3 for Gemini...")
-            mp3_path = convert_to_mp3(audio_path)
-            print(f"Converted MP3 path: {mp3_path}")
-
-            # Generate notes using Gemini on MP3
-            print("Calling generate_notes_from_audio...")
-            notes_content = generate_notes_from_audio(mp3_path, detail_level, format_type)
-            print(f"Notes generated, length: {len(notes_content)}")
-            
-            # Save to storage
-            note = add_note(
-                note_type='meet',
-                title=f"Google Meet Recording: {audio_file.filename}",
-                content=notes_content,
-                metadata={
-                    'filename': audio_file.filename,
-                    'detail_level': detail_level,
-                    'format_type': format_type
-                }
-            )
-            print("Note saved to storage")
-            
+            note = process_audio_note(audio_path, filename, detail_level, format_type)
             return jsonify({
                 'success': True,
                 'note': note
             }), 200
-            
         except Exception as e:
             print(f"ERROR generating notes: {str(e)}")
             import traceback
             traceback.print_exc()
             return jsonify({'error': f'Error generating notes: {str(e)}'}), 500
-        finally:
-            # Clean up temporary files
-            try:
-                cleanup_file(audio_path)
-            except Exception:
-                pass
-            try:
-                if mp3_path:
-                    cleanup_file(mp3_path)
-            except Exception:
-                pass
         
     except Exception as e:
         print(f"ERROR in audio endpoint: {str(e)}")
@@ -139,12 +379,63 @@ def generate_audio_notes():
 
 @app.route('/api/notes', methods=['GET'])
 def get_notes():
-    """Get all notes from history"""
+    """
+    Get notes from history, newest first
+
+    Query params (all optional):
+        limit: page size (capped at MAX_PAGE_SIZE); without it every note is returned
+        before: next_cursor from the previous page, or an ISO timestamp
+        fields: comma-separated projection, e.g. id,title,type,timestamp
+        type: only return 'youtube' or 'meet' notes
+    """
+    try:
+        # Any write to the store changes its version, so an unchanged history
+        # is answered without touching the notes at all
+        query_hash = hashlib.sha1(request.query_string).hexdigest()[:12]
+        etag = f"notes-{get_store_version()}-{query_hash}"
+        if client_has_etag(etag):
+            return not_modified(etag)
+
+        limit = request.args.get('limit', type=int)
+        if limit is not None:
+            limit = max(1, min(limit, MAX_PAGE_SIZE))
+        fields = request.args.get('fields')
+        if fields:
+            fields = [field.strip() for field in fields.split(',') if field.strip()]
+
+        try:
+            notes, next_cursor = list_notes(
+                limit=limit,
+                before=request.args.get('before'),
+                fields=fields,
+                note_type=request.args.get('type')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        response = jsonify({'notes': notes, 'next_cursor': next_cursor})
+        response.set_etag(etag)
+        return response, 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/notes/search', methods=['GET'])
+def search():
+    """
+    Full-text search over notes
+
+    Query params:
+        q: search text (required)
+        limit: maximum number of results (default 20, capped at MAX_PAGE_SIZE)
+    """
     try:
-        notes = get_all_notes()
-        # Sort by timestamp (newest first)
-        notes.sort(key=lambda x: x['timestamp'], reverse=True)
-        return jsonify({'notes': notes}), 200
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'Search query (q) is required'}), 400
+        limit = max(1, min(request.args.get('limit', 20, type=int), MAX_PAGE_SIZE))
+
+        results = search_notes(query, limit=limit)
+        return jsonify({'query': query, 'results': results}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -154,17 +445,50 @@ def get_note(note_id):
     try:
         note = get_note_by_id(note_id)
         if note:
-            return jsonify({'note': note}), 200
+            response = jsonify({'note': note})
+            etag = hashlib.sha1(response.get_data()).hexdigest()
+            if client_has_etag(etag):
+                return not_modified(etag)
+            response.set_etag(etag)
+            return response, 200
         else:
             return jsonify({'error': 'Note not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Status of a background job: queued, running, done (with the result,
+    e.g. the saved note) or failed (with the error)
+    """
+    try:
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify({'job': job}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({'status': 'ok'}), 200
 
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """Cache and job queue statistics for monitoring"""
+    try:
+        return jsonify({
+            'transcript_cache': transcript_cache.stats(),
+            'notes_cache': notes_cache.stats(),
+            'audio_notes_cache': audio_notes_cache.stats(),
+            'gemini_uploads': gemini_uploads.stats(),
+            'jobs': job_queue.stats()
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/test-audio', methods=['POST'])
 def test_audio():
     """Test endpoint to debug audio upload"""
@@ -177,11 +501,13 @@ def test_audio():
             print(f"Content type: {audio_file.content_type}")
             print(f"Content length: {audio_file.content_length}")
             
-            # Save and check file
+            # Save and check file, then remove it again
             audio_path = save_audio_file(audio_file)
-            import os
-            file_size = os.path.getsize(audio_path)
-            print(f"File saved, size: {file_size} bytes")
+            try:
+                file_size = os.path.getsize(audio_path)
+                print(f"File saved, size: {file_size} bytes")
+            finally:
+                cleanup_scratch(audio_path)
             
             return jsonify({
                 'success': True,
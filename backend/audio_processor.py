@@ -1,9 +1,80 @@
 import os
-from werkzeug.utils import secure_filename
+import json
+import shutil
 import subprocess
+import tempfile
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import deque
 
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
 ALLOWED_EXTENSIONS = {'wav', 'mp3', 'ogg', 'webm', 'm4a'}
+# Uploads Gemini accepts as they are: extension -> (ffprobe container name,
+# ffprobe codec names). These are saved and probed, and skip transcoding if
+# the probe agrees; everything else is piped into ffmpeg as it arrives
+GEMINI_AUDIO_FORMATS = {
+    'mp3': ('mp3', {'mp3'}),
+    'm4a': ('m4a', {'aac'}),
+    'ogg': ('ogg', {'vorbis', 'opus'}),
+}
+# Extension for a raw upload that only names its Content-Type
+MIMETYPE_EXTENSIONS = {
+    'audio/webm': 'webm',
+    'video/webm': 'webm',
+    'audio/ogg': 'ogg',
+    'audio/wav': 'wav',
+    'audio/x-wav': 'wav',
+    'audio/wave': 'wav',
+    'audio/mpeg': 'mp3',
+    'audio/mp3': 'mp3',
+    'audio/mp4': 'm4a',
+    'audio/x-m4a': 'm4a',
+}
+
+# Bytes read from an upload per write to ffmpeg's stdin
+STREAM_CHUNK_SIZE = 64 * 1024
+# Only the last lines of ffmpeg's stderr are kept, for error messages; each
+# line is capped too, so a chatty or stuck ffmpeg cannot grow memory
+FFMPEG_STDERR_LINES = 50
+FFMPEG_STDERR_LINE_BYTES = 1024
+# Seconds ffprobe may take to read an upload's headers
+FFPROBE_TIMEOUT = 30
+
+# Speech profile for transcoded audio: mono, 16 kHz, low-bitrate MP3, with
+# leading silence dropped and pauses over a second cut to half a second
+SPEECH_SAMPLE_RATE = 16000
+SPEECH_BITRATE = '32k'
+SPEECH_FILTER = (
+    'silenceremove=start_periods=1:start_threshold=-50dB'
+    ':stop_periods=-1:stop_duration=1:stop_threshold=-50dB:stop_silence=0.5'
+)
+
+# Recordings longer than this (plus SEGMENT_SLACK) are cut into segments of
+# about this length, which Gemini processes in parallel
+SEGMENT_SECONDS = 10 * 60
+# How far from the ideal cut a silence may lie and still be cut at instead;
+# with none in reach the cut falls mid-speech at the ideal point
+SEGMENT_SLACK = 2 * 60
+# What silencedetect counts as a silence; the speech profile leaves pauses
+# of half a second, so this must stay below that
+SILENCE_NOISE = '-35dB'
+SILENCE_MIN_SECONDS = 0.3
+
+# Every upload gets its own scratch directory under UPLOAD_FOLDER, named
+# with this prefix; the janitor removes the ones left behind by crashes
+SCRATCH_PREFIX = 'upload-'
+# How often the janitor sweeps UPLOAD_FOLDER
+JANITOR_INTERVAL = 10 * 60
+# Anything untouched for this long is an orphan, whatever the disk usage
+ORPHAN_TTL = 6 * 3600
+# Above this much disk use, the janitor also removes the least recently
+# touched entries idle for at least JANITOR_GRACE, until back under quota
+UPLOAD_QUOTA_BYTES = 2 * 1024 * 1024 * 1024
+JANITOR_GRACE = 60 * 60
+
+_janitor = None
+_janitor_lock = threading.Lock()
 
 def ensure_upload_dir():
     """Create upload directory if it doesn't exist"""
@@ -13,28 +84,52 @@ def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def make_scratch_dir():
+    """New private directory for one upload's files; remove it with cleanup_scratch"""
+    ensure_upload_dir()
+    return tempfile.mkdtemp(prefix=SCRATCH_PREFIX, dir=UPLOAD_FOLDER)
+
+def cleanup_scratch(filepath):
+    """Delete the scratch directory holding filepath, and everything in it"""
+    scratch_dir = os.path.dirname(os.path.abspath(filepath))
+    if os.path.dirname(scratch_dir) != os.path.abspath(UPLOAD_FOLDER) or \
+            not os.path.basename(scratch_dir).startswith(SCRATCH_PREFIX):
+        cleanup_file(filepath)
+        return
+    try:
+        shutil.rmtree(scratch_dir)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Error cleaning up directory {scratch_dir}: {e}")
+
 def save_audio_file(file):
     """
-    Save uploaded audio file temporarily
+    Save uploaded audio file temporarily, in its own scratch directory
     
     Args:
         file: File object from Flask request
     
     Returns:
-        Path to saved file
+        Path to saved file; remove it with cleanup_scratch
     """
-    ensure_upload_dir()
-    
     if not file or not allowed_file(file.filename):
         raise ValueError("Invalid audio file format")
     
-    # Create temporary file
-    filename = secure_filename(file.filename)
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    
-    file.save(filepath)
+    extension = file.filename.rsplit('.', 1)[1].lower()
+    filepath = os.path.join(make_scratch_dir(), f"recording.{extension}")
+    try:
+        file.save(filepath)
+    except BaseException:
+        cleanup_scratch(filepath)
+        raise
     return filepath
 
+def filename_for_mimetype(mimetype):
+    """Generic upload name for a raw audio body, or None for an unsupported type"""
+    extension = MIMETYPE_EXTENSIONS.get(mimetype)
+    return f"recording.{extension}" if extension else None
+
 def cleanup_file(filepath):
     """Delete temporary audio file"""
     try:
@@ -44,43 +139,359 @@ def cleanup_file(filepath):
         print(f"Error cleaning up file {filepath}: {e}")
 
 
-def convert_to_mp3(input_path: str) -> str:
-    """
-    Convert an audio file (e.g. webm) to mp3 using ffmpeg.
-    Returns the path to the mp3 file.
-    """
-    ensure_upload_dir()
-
-    if not os.path.exists(input_path):
-        raise ValueError(f"Input audio file does not exist: {input_path}")
-
-    base, _ = os.path.splitext(input_path)
-    output_path = base + ".mp3"
-
-    cmd = [
+def _mp3_command(input_arg, output_path):
+    """ffmpeg arguments encoding input_arg (a path or pipe:0) to speech-profile mp3 at output_path"""
+    return [
         "ffmpeg",
         "-y",  # overwrite without asking
-        "-i", input_path,
+        "-hide_banner",
+        "-nostats",  # no progress lines on stderr
+        "-i", input_arg,
         "-vn",  # no video
+        "-af", SPEECH_FILTER,
+        "-ac", "1",
+        "-ar", str(SPEECH_SAMPLE_RATE),
         "-acodec", "libmp3lame",
+        "-b:a", SPEECH_BITRATE,
         output_path,
     ]
 
+def probe_audio(filepath):
+    """
+    Container and stream codecs of a media file, from ffprobe
+    
+    Returns:
+        (format names, [(codec_type, codec_name), ...]), or None if ffprobe
+        is missing or cannot read the file
+    """
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries", "format=format_name:stream=codec_type,codec_name",
+        "-of", "json",
+        filepath,
+    ]
     try:
         result = subprocess.run(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=FFPROBE_TIMEOUT, check=True
+        )
+        info = json.loads(result.stdout)
+    except (OSError, subprocess.SubprocessError, ValueError) as e:
+        print(f"ffprobe failed for {filepath}: {e}")
+        return None
+    formats = set(info.get('format', {}).get('format_name', '').split(','))
+    streams = [(stream.get('codec_type'), stream.get('codec_name')) for stream in info.get('streams', [])]
+    return formats, streams
+
+def is_gemini_ready(filepath, extension):
+    """True if the file is a single audio stream Gemini accepts without transcoding"""
+    if extension not in GEMINI_AUDIO_FORMATS:
+        return False
+    probe = probe_audio(filepath)
+    if probe is None:
+        return False
+    formats, streams = probe
+    container, codecs = GEMINI_AUDIO_FORMATS[extension]
+    return container in formats and len(streams) == 1 and \
+        streams[0][0] == 'audio' and streams[0][1] in codecs
+
+def _drain_stderr(pipe, tail, on_line=None):
+    """Read ffmpeg's stderr to the end, keeping only its last lines"""
+    for line in iter(lambda: pipe.readline(FFMPEG_STDERR_LINE_BYTES), b''):
+        tail.append(line)
+        if on_line:
+            on_line(line.decode("utf-8", errors="ignore"))
+
+def _run_ffmpeg(cmd, stream=None, on_line=None):
+    """
+    Run ffmpeg to completion, feeding it stream (a file-like object) on stdin
+    in STREAM_CHUNK_SIZE pieces if given, and each stderr line to on_line if
+    given. Raises RuntimeError with the tail of ffmpeg's stderr if it fails.
+    """
+    try:
+        process = subprocess.Popen(
             cmd,
-            stdout=subprocess.PIPE,
+            stdin=subprocess.PIPE if stream is not None else subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
             stderr=subprocess.PIPE,
-            check=True,
         )
-        return output_path
     except FileNotFoundError:
         # ffmpeg executable not found on PATH
         raise RuntimeError(
             "ffmpeg is not installed or not found on PATH. "
             "Please install ffmpeg and ensure the 'ffmpeg' command is available."
         )
-    except subprocess.CalledProcessError as e:
-        err = e.stderr.decode("utf-8", errors="ignore")
+    
+    # Drained on a thread so a full stderr pipe can never stall the encoder
+    stderr_tail = deque(maxlen=FFMPEG_STDERR_LINES)
+    reader = threading.Thread(target=_drain_stderr, args=(process.stderr, stderr_tail, on_line), daemon=True)
+    reader.start()
+    try:
+        if stream is not None:
+            try:
+                for chunk in iter(lambda: stream.read(STREAM_CHUNK_SIZE), b''):
+                    process.stdin.write(chunk)
+            except BrokenPipeError:
+                # ffmpeg stopped reading (bad input); its stderr says why
+                pass
+            finally:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+        returncode = process.wait()
+    except BaseException:
+        # e.g. the client disconnected mid-upload
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        reader.join()
+        process.stderr.close()
+    
+    if returncode != 0:
+        err = b''.join(stderr_tail).decode("utf-8", errors="ignore")
         raise RuntimeError(f"ffmpeg conversion failed: {err}")
 
+def convert_to_mp3(input_path: str, output_path: str = None) -> str:
+    """
+    Convert an audio file (e.g. webm) to speech-profile mp3 using ffmpeg,
+    next to the input unless output_path is given.
+    Returns the path to the mp3 file.
+    """
+    ensure_upload_dir()
+
+    if not os.path.exists(input_path):
+        raise ValueError(f"Input audio file does not exist: {input_path}")
+
+    if output_path is None:
+        base, _ = os.path.splitext(input_path)
+        output_path = base + ".mp3"
+
+    _run_ffmpeg(_mp3_command(input_path, output_path))
+    return output_path
+
+def ingest_audio(stream, filename):
+    """
+    Turn an upload into audio Gemini accepts, while it is still being received
+    
+    Formats Gemini may take as they are (GEMINI_AUDIO_FORMATS) are copied to
+    disk in chunks and checked with ffprobe; if the codec is right the file
+    is used untouched, otherwise it is transcoded from there. All others are
+    piped into ffmpeg chunk by chunk, so encoding overlaps the upload, the
+    original is never written to disk and memory use does not depend on the
+    recording's length. Transcoding uses the speech profile (mono 16 kHz
+    low-bitrate mp3, long pauses cut). Everything is written to a scratch
+    directory of its own, so concurrent uploads never collide.
+    
+    Args:
+        stream: File-like object with the upload's bytes (request.stream,
+                or an uploaded file's .stream)
+        filename: Name of the recording; its extension picks the container
+    
+    Returns:
+        Path to the audio file; remove it with cleanup_scratch
+    """
+    if not filename or not allowed_file(filename):
+        raise ValueError("Invalid audio file format")
+    
+    extension = filename.rsplit('.', 1)[1].lower()
+    scratch_dir = make_scratch_dir()
+    try:
+        if extension in GEMINI_AUDIO_FORMATS:
+            filepath = os.path.join(scratch_dir, f"recording.{extension}")
+            with open(filepath, 'wb') as f:
+                shutil.copyfileobj(stream, f, STREAM_CHUNK_SIZE)
+            if is_gemini_ready(filepath, extension):
+                print(f"Audio is already {extension}, skipping transcode")
+                return filepath
+            output_path = convert_to_mp3(filepath, os.path.join(scratch_dir, "audio.mp3"))
+            cleanup_file(filepath)
+            return output_path
+        
+        output_path = os.path.join(scratch_dir, "audio.mp3")
+        _run_ffmpeg(_mp3_command("pipe:0", output_path), stream)
+        return output_path
+    except BaseException:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        raise
+
+def probe_duration(filepath):
+    """Length of a media file in seconds, from ffprobe, or None if unknown"""
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        filepath,
+    ]
+    try:
+        result = subprocess.run(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=FFPROBE_TIMEOUT, check=True
+        )
+        return float(result.stdout.decode().strip())
+    except (OSError, subprocess.SubprocessError, ValueError) as e:
+        print(f"ffprobe could not read the duration of {filepath}: {e}")
+        return None
+
+def find_silences(filepath):
+    """(start, end) seconds of every silence in a recording, from ffmpeg silencedetect"""
+    starts, silences = [], []
+    
+    def on_line(line):
+        # [silencedetect @ 0x...] silence_start: 12.3
+        # [silencedetect @ 0x...] silence_end: 13.1 | silence_duration: 0.8
+        if 'silence_start:' in line:
+            starts.append(float(line.split('silence_start:')[1].split()[0]))
+        elif 'silence_end:' in line and starts:
+            silences.append((starts.pop(), float(line.split('silence_end:')[1].split()[0])))
+    
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-nostats",
+        "-i", filepath,
+        "-vn",
+        "-af", f"silencedetect=noise={SILENCE_NOISE}:d={SILENCE_MIN_SECONDS}",
+        "-f", "null", "-",
+    ]
+    _run_ffmpeg(cmd, on_line=on_line)
+    return silences
+
+def plan_segments(duration, silences):
+    """
+    Cut points splitting a recording into segments of about SEGMENT_SECONDS,
+    each at the middle of the silence nearest its ideal position (within
+    SEGMENT_SLACK)
+    
+    Returns:
+        List of (start, end) seconds covering the whole recording
+    """
+    pauses = sorted((start + end) / 2 for start, end in silences)
+    segments = []
+    start = 0.0
+    while duration - start > SEGMENT_SECONDS + SEGMENT_SLACK:
+        ideal = start + SEGMENT_SECONDS
+        nearby = pauses[bisect_left(pauses, ideal - SEGMENT_SLACK):bisect_right(pauses, ideal + SEGMENT_SLACK)]
+        cut = min(nearby, key=lambda pause: abs(pause - ideal)) if nearby else ideal
+        segments.append((start, cut))
+        start = cut
+    segments.append((start, duration))
+    return segments
+
+def split_audio(filepath, output_dir):
+    """
+    Split a long recording at silences, without re-encoding
+    
+    Args:
+        filepath: Recording to split
+        output_dir: Existing directory for the segment files
+    
+    Returns:
+        List of (start seconds, path) in order; just [(0, filepath)] when the
+        recording is short enough to send whole or its length is unknown
+    """
+    duration = probe_duration(filepath)
+    if not duration or duration <= SEGMENT_SECONDS + SEGMENT_SLACK:
+        return [(0, filepath)]
+    
+    segments = plan_segments(duration, find_silences(filepath))
+    cuts = [start for start, _ in segments[1:]]
+    extension = os.path.splitext(filepath)[1]
+    pattern = os.path.join(output_dir, f"segment-%03d{extension}")
+    _run_ffmpeg([
+        "ffmpeg",
+        "-y",
+        "-hide_banner",
+        "-nostats",
+        "-i", filepath,
+        "-map", "0:a",
+        "-c", "copy",
+        "-f", "segment",
+        "-segment_times", ",".join(f"{cut:.3f}" for cut in cuts),
+        "-reset_timestamps", "1",
+        pattern,
+    ])
+    
+    paths = sorted(os.path.join(output_dir, name) for name in os.listdir(output_dir) if name.startswith("segment-"))
+    print(f"Split {duration:.0f}s recording into {len(paths)} segments at {', '.join(f'{cut:.1f}s' for cut in cuts)}")
+    return list(zip([0.0] + cuts, paths))
+
+def _entry_usage(path):
+    """(bytes, last modification time) of a file or directory tree"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return 0, 0
+    size, mtime = stat.st_size, stat.st_mtime
+    if os.path.isdir(path):
+        size = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                size += stat.st_size
+                mtime = max(mtime, stat.st_mtime)
+    return size, mtime
+
+def _remove_entry(path):
+    """Delete a file or directory tree from UPLOAD_FOLDER"""
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        cleanup_file(path)
+
+def sweep_uploads(now=None):
+    """
+    Remove orphaned files from UPLOAD_FOLDER: anything idle for ORPHAN_TTL,
+    then the least recently touched entries idle for JANITOR_GRACE while
+    the folder is over UPLOAD_QUOTA_BYTES
+    
+    Returns:
+        Dict with the number of entries and bytes removed, and bytes left
+    """
+    now = now or time.time()
+    try:
+        names = os.listdir(UPLOAD_FOLDER)
+    except FileNotFoundError:
+        return {'removed': 0, 'freed_bytes': 0, 'used_bytes': 0}
+    
+    entries = []
+    for name in names:
+        path = os.path.join(UPLOAD_FOLDER, name)
+        size, mtime = _entry_usage(path)
+        entries.append((mtime, size, path))
+    entries.sort()
+    
+    used = sum(size for _, size, _ in entries)
+    removed = freed = 0
+    for mtime, size, path in entries:
+        idle = now - mtime
+        if idle >= ORPHAN_TTL or (used > UPLOAD_QUOTA_BYTES and idle >= JANITOR_GRACE):
+            _remove_entry(path)
+            used -= size
+            freed += size
+            removed += 1
+    
+    if removed:
+        print(f"Upload janitor removed {removed} entries ({freed} bytes), {used} bytes in use")
+    return {'removed': removed, 'freed_bytes': freed, 'used_bytes': used}
+
+def _janitor_loop():
+    """Sweep UPLOAD_FOLDER every JANITOR_INTERVAL, forever"""
+    while True:
+        try:
+            sweep_uploads()
+        except Exception as e:
+            print(f"Upload janitor error: {e}")
+        time.sleep(JANITOR_INTERVAL)
+
+def start_janitor():
+    """Start this process's upload janitor thread, once; its first sweep runs right away"""
+    global _janitor
+    with _janitor_lock:
+        if _janitor is None:
+            _janitor = threading.Thread(target=_janitor_loop, name='upload-janitor', daemon=True)
+            _janitor.start()
@@ -0,0 +1,177 @@
+import json
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+
+from db import connect, data_path
+
+CACHE_DB = data_path('cache.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS cache_lru ON cache (namespace, accessed_at);
+"""
+
+def get_connection():
+    """Return this thread's connection to the cache database"""
+    return connect(CACHE_DB, SCHEMA)
+
+class DiskCache:
+    """
+    Size-bounded LRU cache with a TTL, persisted in data/cache.db
+
+    Values are anything json.dumps accepts and are stored zlib-compressed.
+    Every cache has its own namespace and byte budget; once over budget the
+    least recently used entries are evicted. Hits and misses are counted per
+    process.
+    """
+
+    def __init__(self, namespace, max_bytes, ttl):
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        conn = get_connection()
+        row = conn.execute(
+            "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).fetchone()
+        now = time.time()
+        if row is None or row[1] < now:
+            if row is not None:
+                self.delete(key)
+            self._count(False)
+            return None
+
+        with conn:
+            conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key)
+            )
+        self._count(True)
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(self, key, value, ttl=None):
+        """Store value under key, evicting least recently used entries if over budget"""
+        data = zlib.compress(json.dumps(value).encode('utf-8'))
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        conn = get_connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, size, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, data, len(data), expires_at, now)
+            )
+            self._evict(conn, now)
+
+    def delete(self, key):
+        """Drop key from the cache"""
+        conn = get_connection()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def _evict(self, conn, now):
+        """Remove expired entries, then the least recently used ones until under budget"""
+        conn.execute("DELETE FROM cache WHERE namespace = ? AND expires_at < ?", (self.namespace, now))
+        total = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute(
+            "SELECT key, size FROM cache WHERE namespace = ? ORDER BY accessed_at",
+            (self.namespace,)
+        ).fetchall():
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        """Hit/miss counters for this process plus the cache's current size"""
+        entries, size = get_connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache WHERE namespace = ?",
+            (self.namespace,)
+        ).fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+        }
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one computation
+
+    The first caller for a key runs the function; callers that arrive while
+    it is still running wait for it and get the same result or exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def claim(self, key):
+        """
+        Return (future, leader) for key. A leader must compute the value and
+        settle the future with resolve(); anyone else waits on future.result()
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        return future, leader
+
+    def resolve(self, key, future, result=None, error=None):
+        """Hand a leader's result (or error) to its waiters and end the call for key"""
+        with self._lock:
+            del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) unless a call for key is already in flight"""
+        future, leader = self.claim(key)
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.resolve(key, future, error=e)
+            raise
+        self.resolve(key, future, result)
+        return result
+
+    def in_flight(self):
+        """Number of keys currently being computed"""
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,42 @@
+import os
+import sqlite3
+import threading
+
+# Every SQLite store (notes, cache, jobs) lives here; NOTEGEN_DATA_DIR moves
+# them, e.g. to keep tests and benchmarks away from real data
+DATA_DIR = os.environ.get('NOTEGEN_DATA_DIR') or \
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+_local = threading.local()
+
+def data_path(name):
+    """Path of a file in DATA_DIR"""
+    return os.path.join(DATA_DIR, name)
+
+def connect(path, schema=None, setup=None):
+    """
+    Return this thread's connection to the database at path
+
+    A new connection is put in WAL mode, runs the schema script and then
+    setup(conn) if given. Connections are never shared with a forked child
+    (gunicorn --preload): one made by another pid is replaced.
+    """
+    conns = getattr(_local, 'conns', None)
+    if conns is None or _local.pid != os.getpid():
+        conns = _local.conns = {}
+        _local.pid = os.getpid()
+    conn = conns.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        # WAL lets readers run alongside the single writer and turns every
+        # insert into an append to the log instead of a rewrite of the store
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        if schema:
+            conn.executescript(schema)
+        conns[path] = conn
+        if setup:
+            setup(conn)
+    return conn
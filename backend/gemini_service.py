@@ -1,7 +1,16 @@
+import hashlib
 import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from google import genai
 from dotenv import load_dotenv
 
+from audio_processor import split_audio
+from cache import DiskCache, SingleFlight
+from youtube_service import format_timestamp
+
 # Load .env file from project root (one level up from backend directory)
 env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
 env_path = os.path.abspath(env_path)  # Convert to absolute path
@@ -14,6 +23,44 @@ if not api_key:
 
 client = genai.Client(api_key=api_key)
 
+# Model for audio notes and for merging per-segment notes
+AUDIO_MODEL = "gemini-2.5-flash"
+# How long an upload may take to become ACTIVE before we give up on it
+FILE_ACTIVE_TIMEOUT = 180
+# Segments of a long recording uploaded and summarized at the same time
+AUDIO_SEGMENT_WORKERS = 4
+
+AUDIO_DETAIL_INSTRUCTIONS = {
+    'brief': 'Provide a brief summary with only the most important points.',
+    'medium': 'Provide a comprehensive summary covering all main topics and key details.',
+    'detailed': 'Provide a very detailed summary with all topics, subtopics, examples, and important statements.'
+}
+
+AUDIO_FORMAT_INSTRUCTIONS = {
+    'bullet': 'Format the notes as bullet points with clear headings and sub-bullets.',
+    'paragraph': 'Format the notes as well-structured paragraphs with clear sections and headings.'
+}
+
+# Bump whenever a prompt or model change alters audio notes, so notes cached
+# by older code stop being served; part of the audio notes cache key
+AUDIO_NOTES_VERSION = 1
+
+# Finished notes per (audio SHA-256, detail_level, format_type), plus the
+# notes for each segment of a long recording, which don't depend on either
+audio_notes_cache = DiskCache('audio_notes', max_bytes=64 * 1024 * 1024, ttl=7 * 24 * 3600)
+
+# Files already uploaded to Gemini, by SHA-256 of their bytes; each entry
+# lives until shortly before Gemini deletes the file (48 hours by default)
+gemini_uploads = DiskCache('gemini_uploads', max_bytes=8 * 1024 * 1024, ttl=47 * 3600)
+# Entries are dropped this long before the file's expiration_time, so a
+# reused file can't expire mid-request
+UPLOAD_EXPIRY_MARGIN = 30 * 60
+
+# Identical uploads or recordings arriving together share one run
+_in_flight = SingleFlight()
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
 def generate_notes_from_youtube(youtube_url, detail_level='medium', format_type='bullet'):
     """
     Generate notes from YouTube video URL
@@ -64,38 +111,186 @@ Generate the notes now:"""
     except Exception as e:
         raise Exception(f"Error generating notes from YouTube video: {str(e)}")
 
-def generate_notes_from_audio(audio_file_path, detail_level='medium', format_type='bullet'):
+def file_sha256(filepath):
+    """Hex SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _registered_upload(gemini, digest):
+    """The ACTIVE Gemini file uploaded earlier with these contents, or None"""
+    entry = gemini_uploads.get(digest)
+    if entry is None:
+        return None
+    try:
+        uploaded_file = gemini.files.get(name=entry['name'])
+    except Exception as e:
+        print(f"Registered upload {entry['name']} is gone: {e}")
+        uploaded_file = None
+    state = getattr(uploaded_file, "state", None)
+    if getattr(state, "name", None) != "ACTIVE":
+        gemini_uploads.delete(digest)
+        return None
+    print(f"Reusing Gemini file {entry['name']}")
+    return uploaded_file
+
+def _register_upload(digest, uploaded_file):
+    """Remember an ACTIVE upload until shortly before Gemini expires it"""
+    ttl = None
+    expiration_time = getattr(uploaded_file, "expiration_time", None)
+    if expiration_time is not None:
+        ttl = expiration_time.timestamp() - time.time() - UPLOAD_EXPIRY_MARGIN
+        if ttl <= 0:
+            return
+    gemini_uploads.set(digest, {'name': uploaded_file.name}, ttl=ttl)
+
+def _upload_audio(gemini, audio_file_path):
+    """
+    Upload a file to Gemini and wait until it is ACTIVE; returns the file.
+    A file with the same contents that Gemini still holds is reused instead.
+    """
+    digest = file_sha256(audio_file_path)
+    uploaded_file = _registered_upload(gemini, digest)
+    if uploaded_file is None:
+        uploaded_file = _in_flight.do(f"upload:{digest}", _upload_and_register, gemini, audio_file_path, digest)
+    return uploaded_file
+
+def _upload_and_register(gemini, audio_file_path, digest):
+    """Upload for one single-flight leader, wait for ACTIVE and register the file"""
+    # Upload audio file using official google-genai client
+    print(f"Uploading {os.path.basename(audio_file_path)} to Gemini via google-genai client...")
+    uploaded_file = gemini.files.upload(file=audio_file_path)
+    print(f"Audio file uploaded: {uploaded_file.name}")
+
+    # Wait until file is ACTIVE before using it, to avoid FAILED_PRECONDITION
+    waited = 0
+    state = getattr(uploaded_file, "state", None)
+    state_name = getattr(state, "name", None) if state else None
+    print(f"Initial uploaded file state: {state_name}")
+
+    while state_name not in ("ACTIVE", "FAILED") and waited < FILE_ACTIVE_TIMEOUT:
+        time.sleep(2)
+        waited += 2
+        uploaded_file = gemini.files.get(name=uploaded_file.name)
+        state = getattr(uploaded_file, "state", None)
+        state_name = getattr(state, "name", None) if state else None
+        print(f"Polled file state: {state_name} (waited {waited}s)")
+
+    if state_name != "ACTIVE":
+        raise Exception(f"Uploaded audio file is not ready (state={state_name}). Please try again with a shorter recording.")
+    _register_upload(digest, uploaded_file)
+    return uploaded_file
+
+def _notes_for_audio(gemini, prompt, audio_file_path):
+    """Upload one audio file and generate notes for it with prompt"""
+    uploaded_file = _upload_audio(gemini, audio_file_path)
+    print("Generating content with audio...")
+    # Official pattern: contents=[prompt, uploaded_file]
+    response = gemini.models.generate_content(
+        model=AUDIO_MODEL,
+        contents=[prompt, uploaded_file]
+    )
+    return response.text.strip()
+
+def _notes_for_segments(gemini, segments, detail_level, format_type):
+    """
+    Notes for a recording split into (start seconds, path) segments: each
+    segment is uploaded and summarized on a bounded pool, then one text-only
+    call merges the per-segment notes
+    
+    Returns:
+        Tuple of (notes, merged); merged is False if the merge call failed
+        and the notes are the per-segment ones in order
+    """
+    total = len(segments)
+
+    def segment_notes(index):
+        start, path = segments[index]
+        end = segments[index + 1][0] if index + 1 < total else None
+        span = f"{format_timestamp(start)}-{format_timestamp(end)}" if end is not None else f"{format_timestamp(start)} to the end"
+        prompt = f"""This is part {index + 1} of {total} of one meeting recording ({span}).
+Please transcribe it and write detailed notes on this part only.
+
+Include:
+- Topics discussed
+- Key points and decisions made
+- Action items and next steps
+- Important details or quotes
+- Participants' contributions (if identifiable)
+
+Do not add an introduction or conclusion; other parts are summarized separately.
+
+Generate the notes now:"""
+        cache_key = f"{file_sha256(path)}:part{index + 1}of{total}:{span}:v{AUDIO_NOTES_VERSION}"
+        notes = audio_notes_cache.get(cache_key)
+        if notes is None:
+            notes = _notes_for_audio(gemini, prompt, path)
+            audio_notes_cache.set(cache_key, notes)
+        return notes
+
+    with ThreadPoolExecutor(max_workers=min(AUDIO_SEGMENT_WORKERS, total)) as pool:
+        parts = list(pool.map(segment_notes, range(total)))
+    print(f"Notes generated for {total} segments, merging...")
+
+    sections = "\n\n".join(
+        f"### Part {i} (from {format_timestamp(start)})\n\n{text}"
+        for i, ((start, _), text) in enumerate(zip(segments, parts), 1)
+    )
+    prompt = f"""Below are notes on consecutive parts of one meeting recording, in order.
+Merge them into one coherent set of meeting notes for the whole meeting: combine topics that span parts, drop repetition, and keep every decision and action item.
+
+{AUDIO_DETAIL_INSTRUCTIONS.get(detail_level, AUDIO_DETAIL_INSTRUCTIONS['medium'])}
+
+{AUDIO_FORMAT_INSTRUCTIONS.get(format_type, AUDIO_FORMAT_INSTRUCTIONS['bullet'])}
+
+Include:
+- Main topics discussed
+- Key points and decisions made
+- Action items and next steps
+- Important details or quotes
+- Participants' contributions (if identifiable)
+
+{sections}
+
+Generate the merged notes now:"""
+    try:
+        response = gemini.models.generate_content(model=AUDIO_MODEL, contents=[prompt])
+        return response.text.strip(), True
+    except Exception as e:
+        # The per-part notes are still worth returning
+        print(f"Merging segment notes failed, returning them in order: {e}")
+        return sections, False
+
+def generate_notes_from_audio(audio_file_path, detail_level='medium', format_type='bullet', gemini_client=None):
     """
     Generate notes from audio file (transcribe and summarize)
     
+    Recordings longer than audio_processor.SEGMENT_SECONDS are split at
+    silences; the segments are processed concurrently and their notes merged.
+    Results are cached by the audio's SHA-256, and files Gemini still holds
+    are not uploaded again, so a resubmitted recording costs at most the
+    calls its new options need.
+    
     Args:
         audio_file_path: Path to audio file
         detail_level: 'brief', 'medium', or 'detailed'
         format_type: 'bullet' or 'paragraph'
+        gemini_client: google-genai client (or a stand-in with the same
+                       files/models methods); the module's client by default
     
     Returns:
         Generated notes as string
     """
-    # Use Gemini 2.5 Flash for audio + text (matches official sample syntax)
-    model = "gemini-2.5-flash"
+    gemini = gemini_client or client
     
     # Build prompt based on customization options
-    detail_instructions = {
-        'brief': 'Provide a brief summary with only the most important points.',
-        'medium': 'Provide a comprehensive summary covering all main topics and key details.',
-        'detailed': 'Provide a very detailed summary with all topics, subtopics, examples, and important statements.'
-    }
-    
-    format_instructions = {
-        'bullet': 'Format the notes as bullet points with clear headings and sub-bullets.',
-        'paragraph': 'Format the notes as well-structured paragraphs with clear sections and headings.'
-    }
-    
     prompt = f"""Please transcribe this audio recording and generate comprehensive meeting notes.
 
-{detail_instructions.get(detail_level, detail_instructions['medium'])}
+{AUDIO_DETAIL_INSTRUCTIONS.get(detail_level, AUDIO_DETAIL_INSTRUCTIONS['medium'])}
 
-{format_instructions.get(format_type, format_instructions['bullet'])}
+{AUDIO_FORMAT_INSTRUCTIONS.get(format_type, AUDIO_FORMAT_INSTRUCTIONS['bullet'])}
 
 Include:
 - Main topics discussed
@@ -117,44 +312,40 @@ Generate the notes now:"""
         if file_size == 0:
             raise Exception("Audio file is empty")
         
-        # Upload audio file using official google-genai client
-        print("Uploading audio file to Gemini via google-genai client...")
-        uploaded_file = client.files.upload(file=audio_file_path)
-        print(f"Audio file uploaded: {uploaded_file.name}")
-
-        # Wait until file is ACTIVE before using it, to avoid FAILED_PRECONDITION
-        max_wait_secs = 180
-        waited = 0
-        state = getattr(uploaded_file, "state", None)
-        state_name = getattr(state, "name", None) if state else None
-        print(f"Initial uploaded file state: {state_name}")
-
-        while state_name not in ("ACTIVE", "FAILED") and waited < max_wait_secs:
-            import time
-            time.sleep(2)
-            waited += 2
-            uploaded_file = client.files.get(name=uploaded_file.name)
-            state = getattr(uploaded_file, "state", None)
-            state_name = getattr(state, "name", None) if state else None
-            print(f"Polled file state: {state_name} (waited {waited}s)")
-
-        if state_name != "ACTIVE":
-            raise Exception(f"Uploaded audio file is not ready (state={state_name}). Please try again with a shorter recording.")
-
-        print("Generating content with audio...")
-        # Official pattern: contents=[prompt, uploaded_file]
-        response = client.models.generate_content(
-            model=model,
-            contents=[prompt, uploaded_file]
+        cache_key = f"{file_sha256(audio_file_path)}:{detail_level}:{format_type}:v{AUDIO_NOTES_VERSION}"
+        result_text = audio_notes_cache.get(cache_key)
+        if result_text is not None:
+            print("Returning cached notes for this recording")
+            return result_text
+        
+        result_text = _in_flight.do(
+            cache_key, _generate_and_cache, gemini, cache_key, prompt, audio_file_path, detail_level, format_type
         )
-
         print("Content generated successfully")
-        result_text = response.text.strip()
-
         return result_text
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise Exception(f"Error generating notes from audio: {str(e)}")
 
-
+def _generate_and_cache(gemini, cache_key, prompt, audio_file_path, detail_level, format_type):
+    """Generate notes for one single-flight leader and cache them if complete"""
+    # Another worker process may have finished the same recording meanwhile
+    result_text = audio_notes_cache.get(cache_key)
+    if result_text is not None:
+        return result_text
+    
+    segment_dir = tempfile.mkdtemp(prefix='segments-', dir=os.path.dirname(os.path.abspath(audio_file_path)))
+    try:
+        segments = split_audio(audio_file_path, segment_dir)
+        if len(segments) > 1:
+            result_text, merged = _notes_for_segments(gemini, segments, detail_level, format_type)
+        else:
+            result_text, merged = _notes_for_audio(gemini, prompt, audio_file_path), True
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
+    
+    # Unmerged per-segment notes are a fallback, not worth keeping
+    if merged:
+        audio_notes_cache.set(cache_key, result_text)
+    return result_text
@@ -0,0 +1,201 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+from db import connect, data_path
+
+JOBS_DB = data_path('jobs.db')
+
+# Finished jobs are kept this long for clients to collect their results
+JOB_TTL = 24 * 3600
+# Every queue refreshes the heartbeat of its unfinished jobs this often. A
+# job whose heartbeat is older than JOB_HEARTBEAT_TIMEOUT lost its queue
+# (the server stopped or restarted) and is failed.
+JOB_HEARTBEAT_INTERVAL = 10
+JOB_HEARTBEAT_TIMEOUT = 60
+# Latency stats cover at most this many of the most recently finished jobs
+STATS_WINDOW = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    heartbeat_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT,
+    progress TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, finished_at);
+"""
+
+def get_connection():
+    """Return this thread's connection to the jobs database"""
+    return connect(JOBS_DB, SCHEMA)
+
+_current = threading.local()
+
+def current_job_id():
+    """Id of the job running on this thread, or None outside a job"""
+    return getattr(_current, 'job_id', None)
+
+def report_progress(job_id, progress):
+    """Publish a JSON-serializable progress value for a running job; shown by JobQueue.get"""
+    conn = get_connection()
+    with conn:
+        conn.execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress), job_id))
+
+def _percentile(values, fraction):
+    """fraction-th percentile of a sorted list (nearest rank), or None if empty"""
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(fraction * len(values)))], 2)
+
+class JobQueue:
+    """
+    Background execution of long note-generation pipelines
+
+    submit() records a job in data/jobs.db and hands it to this process's
+    pool of worker threads; the request that created it returns at once.
+    Status and results live in SQLite, so any worker process can answer a
+    status query. Jobs are owned by a random per-queue id rather than a pid
+    (a restarted server in a container is pid 1 again), and a job whose
+    queue stopped sending heartbeats is reported as failed instead of
+    staying 'running' forever.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.instance = uuid4().hex
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='jobs')
+        self._heartbeat = None
+        self._heartbeat_lock = threading.Lock()
+
+    def _start_heartbeat(self):
+        """Start the thread refreshing this queue's job heartbeats, once"""
+        with self._heartbeat_lock:
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._heartbeat_loop, name='jobs-heartbeat', daemon=True)
+                self._heartbeat.start()
+
+    def _heartbeat_loop(self):
+        """Mark this queue's unfinished jobs as alive every JOB_HEARTBEAT_INTERVAL, forever"""
+        while True:
+            time.sleep(JOB_HEARTBEAT_INTERVAL)
+            try:
+                conn = get_connection()
+                with conn:
+                    conn.execute(
+                        "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                        (time.time(), self.instance)
+                    )
+            except Exception as e:
+                print(f"Job heartbeat error: {e}")
+
+    def _fail_orphans(self, conn, job_id=None):
+        """Fail unfinished jobs (all, or just job_id) of queues that stopped sending heartbeats"""
+        now = time.time()
+        query = ("UPDATE jobs SET status = 'failed', finished_at = ?, error = ? "
+                 "WHERE status IN ('queued', 'running') AND owner != ? AND heartbeat_at < ?")
+        params = [now, 'The server restarted before the job finished', self.instance, now - JOB_HEARTBEAT_TIMEOUT]
+        if job_id is not None:
+            query += " AND id = ?"
+            params.append(job_id)
+        with conn:
+            conn.execute(query, params)
+
+    def submit(self, kind, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs), whose return value must be JSON-serializable; returns the job id"""
+        job_id = uuid4().hex
+        now = time.time()
+        conn = get_connection()
+        with conn:
+            conn.execute("DELETE FROM jobs WHERE finished_at < ?", (now - JOB_TTL,))
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, owner, heartbeat_at, created_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, self.instance, now, now)
+            )
+        self._start_heartbeat()
+        self._pool.submit(self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job_id, fn, args, kwargs):
+        """Execute one job on a worker thread, recording its outcome"""
+        conn = get_connection()
+        with conn:
+            conn.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), job_id))
+        _current.job_id = job_id
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            with conn:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ?",
+                    (time.time(), str(e), job_id)
+                )
+        else:
+            with conn:
+                conn.execute(
+                    "UPDATE jobs SET status = 'done', finished_at = ?, result = ? WHERE id = ?",
+                    (time.time(), json.dumps(result), job_id)
+                )
+        finally:
+            _current.job_id = None
+
+    def get(self, job_id):
+        """Status dict for a job, or None if it is unknown (or expired)"""
+        conn = get_connection()
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        if row['status'] in ('queued', 'running') and row['owner'] != self.instance and \
+                row['heartbeat_at'] < time.time() - JOB_HEARTBEAT_TIMEOUT:
+            self._fail_orphans(conn, job_id)
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+        job = {
+            'id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+        }
+        if row['progress'] is not None:
+            job['progress'] = json.loads(row['progress'])
+        if row['status'] == 'done':
+            job['result'] = json.loads(row['result'])
+        elif row['status'] == 'failed':
+            job['error'] = row['error']
+        return job
+
+    def stats(self):
+        """Queue depth across all processes, plus wait and run latencies of recent jobs"""
+        conn = get_connection()
+        self._fail_orphans(conn)
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        recent = conn.execute(
+            "SELECT started_at - created_at, finished_at - started_at FROM jobs "
+            "WHERE finished_at IS NOT NULL AND started_at IS NOT NULL "
+            "ORDER BY finished_at DESC LIMIT ?",
+            (STATS_WINDOW,)
+        ).fetchall()
+        waits = sorted(wait for wait, _ in recent)
+        runs = sorted(run for _, run in recent)
+        return {
+            'workers': self.workers,
+            'queued': counts.get('queued', 0),
+            'running': counts.get('running', 0),
+            'done': counts.get('done', 0),
+            'failed': counts.get('failed', 0),
+            'wait_seconds': {'p50': _percentile(waits, 0.5), 'p95': _percentile(waits, 0.95)},
+            'run_seconds': {'p50': _percentile(runs, 0.5), 'p95': _percentile(runs, 0.95)},
+        }
@@ -1,37 +1,335 @@
+import bisect
 import json
 import os
+import re
+import threading
+import zlib
+from contextlib import contextmanager
 from datetime import datetime
 from uuid import uuid4
 
-DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
-NOTES_FILE = os.path.join(DATA_DIR, 'notes.json')
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev server only
+    fcntl = None
+
+from db import DATA_DIR, connect, data_path
+
+NOTES_FILE = data_path('notes.json')  # legacy store, migrated once into NOTES_DB
+NOTES_DB = data_path('notes.db')
+# Advisory lock serializing schema setup and the notes.json import across processes
+LOCK_FILE = data_path('notes.lock')
+
+HEADER_COLUMNS = ('seq', 'id', 'type', 'timestamp', 'title', 'preview', 'metadata')
+# Fields a listing can project; everything but content is served from memory
+NOTE_FIELDS = ('id', 'type', 'timestamp', 'title', 'preview', 'content', 'metadata')
+PREVIEW_LENGTH = 200
+# Note bodies are long, repetitive markdown; they are stored zlib-compressed
+# and only inflated when a caller actually asks for content
+CONTENT_COMPRESSION_LEVEL = 6
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    type TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    title TEXT NOT NULL,
+    content BLOB NOT NULL,
+    metadata TEXT NOT NULL DEFAULT '{}',
+    preview TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS notes_timestamp ON notes (timestamp);
+
+-- Bumped by every write to notes, including edits made outside this app,
+-- so the in-process index knows when it is stale
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0);
+-- Random per-database id, so a recreated notes.db never reuses old versions
+INSERT OR IGNORE INTO meta (key, value) VALUES ('instance', abs(random()));
+CREATE TRIGGER IF NOT EXISTS notes_generation_insert AFTER INSERT ON notes BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'generation';
+END;
+CREATE TRIGGER IF NOT EXISTS notes_generation_update AFTER UPDATE ON notes BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'generation';
+END;
+CREATE TRIGGER IF NOT EXISTS notes_generation_delete AFTER DELETE ON notes BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'generation';
+END;
+-- Bumped only by updates and deletes. Notes are otherwise append-only, so
+-- while this is unchanged the index can catch up on just the new seqs.
+INSERT OR IGNORE INTO meta (key, value) VALUES ('rewrites', 0);
+CREATE TRIGGER IF NOT EXISTS notes_rewrites_update AFTER UPDATE ON notes BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'rewrites';
+END;
+CREATE TRIGGER IF NOT EXISTS notes_rewrites_delete AFTER DELETE ON notes BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'rewrites';
+END;
+
+-- Full-text index over notes; rowid is notes.seq. Contentless, so the
+-- bodies aren't stored a second time uncompressed.
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+    title, content, video_title, filename,
+    content = '',
+    tokenize = 'porter unicode61'
+);
+"""
+
+# bm25 column weights for notes_fts: a hit in the title or the source's
+# name counts for more than one buried in the body
+SEARCH_WEIGHTS = (10.0, 1.0, 5.0, 5.0)
+# bm25 has to score every match, so a query for a near-ubiquitous word costs
+# time proportional to the whole corpus. Only the newest this many matches
+# are ranked, plus older ones with a query word in their title or video
+# title; queries matching fewer notes are ranked exactly.
+SEARCH_RANK_WINDOW = 2000
+SNIPPET_WIDTH = 160
+# A list_notes cursor that isn't a note id must look like a stored timestamp
+# (datetime.isoformat()), or it would be compared against them as any string
+CURSOR_TIMESTAMP_RE = re.compile(r'\d{4}-\d{2}-\d{2}(?:T\d{2}:\d{2}(?::\d{2}(?:\.\d{1,6})?)?)?')
+
+_init_lock = threading.Lock()
+_initialized = False
+
+# Resident index of note headers (every field except content). Reads are
+# served from here and only the requested bodies are fetched from SQLite.
+_index_lock = threading.RLock()
+_index = {
+    'generation': None,
+    'rewrites': None,
+    'max_seq': 0,     # newest seq in the index; later rows are loaded incrementally
+    'by_id': {},      # id -> header dict, metadata as JSON text
+    'seq': {},        # id -> seq, to turn a cursor id back into its order key
+    'order': [],      # (timestamp, seq, id), oldest first
+    'by_type': {},    # note type -> its own (timestamp, seq, id) list, oldest first
+}
 
 def ensure_data_dir():
     """Create data directory if it doesn't exist"""
     os.makedirs(DATA_DIR, exist_ok=True)
-    if not os.path.exists(NOTES_FILE):
-        with open(NOTES_FILE, 'w') as f:
-            json.dump({"notes": []}, f, indent=2)
 
-def load_notes():
-    """Load all notes from JSON file"""
+@contextmanager
+def _store_lock():
+    """Hold an exclusive advisory lock on the store across processes"""
     ensure_data_dir()
+    with open(LOCK_FILE, 'a') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+def get_connection():
+    """Return this thread's SQLite connection, opening it on first use"""
+    return connect(NOTES_DB, setup=init_db)
+
+def init_db(conn):
+    """Create the schema and import the legacy notes.json (once per process)"""
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        # Several workers may start at once; let one of them do the setup and
+        # the others find it already done
+        with _store_lock():
+            conn.executescript(SCHEMA)
+            migrate_json_notes(conn)
+            backfill_search_index(conn)
+        _initialized = True
+
+def compress_content(content):
+    """Encode a note body for storage"""
+    return zlib.compress(content.encode('utf-8'), CONTENT_COMPRESSION_LEVEL)
+
+def decompress_content(value):
+    """Decode a stored note body"""
+    return zlib.decompress(value).decode('utf-8')
+
+def make_preview(content):
+    """Plain-text teaser of a note body, as shown in the history list"""
+    preview = content[:PREVIEW_LENGTH]
+    preview = re.sub(r'#{1,6}\s+', '', preview)
+    return preview.replace('*', '')
+
+def migrate_json_notes(conn):
+    """
+    One-shot import of the legacy data/notes.json into the SQLite store.
+
+    The JSON file is renamed to notes.json.migrated afterwards so the import
+    never runs twice; ids are unique, so a re-run after a crash is harmless.
+    A file that can't be read or parsed is left where it is, so no note in
+    it is lost, and the import is tried again on the next start.
+    """
+    if not os.path.exists(NOTES_FILE):
+        return 0
+
     try:
         with open(NOTES_FILE, 'r') as f:
-            data = json.load(f)
-            return data.get('notes', [])
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
+            notes = json.load(f)['notes']
+        if not isinstance(notes, list):
+            raise ValueError("'notes' is not a list")
+    except Exception as e:
+        print(f"ERROR: could not import {NOTES_FILE}, leaving it in place: {e!r}. "
+              f"Fix or remove the file and restart to import its notes.")
+        return 0
 
-def save_notes(notes):
-    """Save notes to JSON file"""
-    ensure_data_dir()
-    with open(NOTES_FILE, 'w') as f:
-        json.dump({"notes": notes}, f, indent=2)
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO notes (id, type, timestamp, title, content, metadata, preview) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    note['id'],
+                    note.get('type', ''),
+                    note.get('timestamp', ''),
+                    note.get('title', ''),
+                    compress_content(note.get('content', '')),
+                    json.dumps(note.get('metadata') or {}),
+                    make_preview(note.get('content', '')),
+                )
+                for note in notes if note.get('id')
+            ]
+        )
+    os.replace(NOTES_FILE, NOTES_FILE + '.migrated')
+    print(f"Migrated {len(notes)} notes from {NOTES_FILE} to {NOTES_DB}")
+    return len(notes)
+
+def _index_for_search(conn, rows):
+    """Add (seq, title, content, metadata) rows to the full-text index"""
+    entries = []
+    for seq, title, content, metadata in rows:
+        if isinstance(metadata, str):
+            metadata = json.loads(metadata) if metadata else {}
+        entries.append((
+            seq,
+            title,
+            content,
+            metadata.get('video_title', ''),
+            metadata.get('filename', ''),
+        ))
+    conn.executemany(
+        "INSERT INTO notes_fts (rowid, title, content, video_title, filename) VALUES (?, ?, ?, ?, ?)",
+        entries
+    )
+
+def backfill_search_index(conn):
+    """Index notes added without the search index, e.g. by migrate_json_notes"""
+    rows = conn.execute(
+        "SELECT seq, title, content, metadata FROM notes "
+        "WHERE seq NOT IN (SELECT rowid FROM notes_fts)"
+    ).fetchall()
+    if rows:
+        with conn:
+            _index_for_search(conn, [
+                (row['seq'], row['title'], decompress_content(row['content']), row['metadata'])
+                for row in rows
+            ])
+        print(f"Indexed {len(rows)} notes for search")
+
+def _row_to_header(row):
+    """Convert a notes table row into a resident index header"""
+    header = dict(row)
+    header.pop('seq', None)
+    header['metadata'] = header['metadata'] or '{}'
+    return header
+
+def _header_value(header, field):
+    """
+    One field of an index header as the API returns it
+
+    Metadata is kept as JSON text in the index and parsed for every caller,
+    so changes a caller makes to its dict never leak into later reads.
+    """
+    if field == 'metadata':
+        return json.loads(header['metadata'])
+    return header[field]
+
+def _public_header(header):
+    """Copy of an index header as the API returns it"""
+    return dict(header, metadata=_header_value(header, 'metadata'))
+
+def get_generation(conn=None):
+    """Return the store's write generation counter"""
+    conn = conn or get_connection()
+    return conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+def get_store_version():
+    """
+    Opaque token that changes whenever any note is written; cheap enough to
+    check on every request, e.g. as an HTTP validator
+    """
+    rows = dict(get_connection().execute(
+        "SELECT key, value FROM meta WHERE key IN ('instance', 'generation')"
+    ).fetchall())
+    return f"{rows['instance']:x}-{rows['generation']}"
+
+def _meta_counters(conn):
+    """(generation, rewrites) counters of the store"""
+    rows = dict(conn.execute("SELECT key, value FROM meta WHERE key IN ('generation', 'rewrites')").fetchall())
+    return rows['generation'], rows['rewrites']
+
+def _index_add(header, seq):
+    """Put one new note's header into the index (caller holds _index_lock)"""
+    key = (header['timestamp'], seq, header['id'])
+    if header['id'] not in _index['by_id']:
+        bisect.insort(_index['order'], key)
+        bisect.insort(_index['by_type'].setdefault(header['type'], []), key)
+    _index['by_id'][header['id']] = header
+    _index['seq'][header['id']] = seq
+    _index['max_seq'] = max(_index['max_seq'], seq)
+
+def _refresh_index(conn):
+    """
+    Bring the resident index up to date with the store
+
+    Notes written since the last refresh (by any connection or process)
+    are appended by seq; only an update or delete forces a full rebuild.
+    """
+    generation, rewrites = _meta_counters(conn)
+    with _index_lock:
+        if _index['generation'] == generation:
+            return
+        # Read the counters and the rows from one snapshot so they agree
+        conn.execute('BEGIN')
+        try:
+            generation, rewrites = _meta_counters(conn)
+            rebuild = _index['rewrites'] != rewrites
+            rows = conn.execute(
+                f"SELECT {', '.join(HEADER_COLUMNS)} FROM notes WHERE seq > ? ORDER BY timestamp, seq",
+                (0 if rebuild else _index['max_seq'],)
+            ).fetchall()
+        finally:
+            conn.execute('COMMIT')
+        if rebuild:
+            _index['by_id'] = {row['id']: _row_to_header(row) for row in rows}
+            _index['seq'] = {row['id']: row['seq'] for row in rows}
+            _index['order'] = [(row['timestamp'], row['seq'], row['id']) for row in rows]
+            _index['by_type'] = {}
+            for row in rows:
+                _index['by_type'].setdefault(row['type'], []).append((row['timestamp'], row['seq'], row['id']))
+            _index['max_seq'] = max((row['seq'] for row in rows), default=0)
+        else:
+            for row in rows:
+                _index_add(_row_to_header(row), row['seq'])
+        _index['generation'] = generation
+        _index['rewrites'] = rewrites
+
+def _index_insert(header, seq, generation):
+    """Apply our own insert to the index, unless someone else wrote in between"""
+    with _index_lock:
+        # Otherwise leave it to the next refresh, which loads every seq past
+        # max_seq; adding ours now would move max_seq past the missed ones
+        if _index['generation'] == generation - 1:
+            _index_add(header, seq)
+            _index['generation'] = generation
 
 def add_note(note_type, title, content, metadata=None):
     """Add a new note to storage"""
-    notes = load_notes()
     new_note = {
         "id": str(uuid4()),
         "type": note_type,
@@ -40,20 +338,212 @@ def add_note(note_type, title, content, metadata=None):
         "content": content,
         "metadata": metadata or {}
     }
-    notes.append(new_note)
-    save_notes(notes)
+    preview = make_preview(content)
+    metadata_json = json.dumps(new_note['metadata'])
+    conn = get_connection()
+    with conn:
+        # Take the write lock up front: concurrent writers, threads or other
+        # worker processes, then queue on the busy timeout instead of failing
+        conn.execute('BEGIN IMMEDIATE')
+        cursor = conn.execute(
+            "INSERT INTO notes (id, type, timestamp, title, content, metadata, preview) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                new_note['id'],
+                new_note['type'],
+                new_note['timestamp'],
+                new_note['title'],
+                compress_content(content),
+                metadata_json,
+                preview,
+            )
+        )
+        _index_for_search(conn, [(cursor.lastrowid, title, content, new_note['metadata'])])
+        generation = get_generation(conn)
+    header = {key: value for key, value in new_note.items() if key != 'content'}
+    header['preview'] = preview
+    header['metadata'] = metadata_json
+    _index_insert(header, cursor.lastrowid, generation)
     return new_note
 
+def _fetch_contents(conn, note_ids):
+    """Fetch the bodies of just the given notes, keyed by id"""
+    contents = {}
+    for i in range(0, len(note_ids), 500):
+        chunk = note_ids[i:i + 500]
+        placeholders = ', '.join('?' * len(chunk))
+        for row in conn.execute(f"SELECT id, content FROM notes WHERE id IN ({placeholders})", chunk):
+            contents[row['id']] = decompress_content(row['content'])
+    return contents
+
+def list_notes(limit=None, before=None, fields=None, note_type=None):
+    """
+    List notes newest first, one page at a time
+
+    Args:
+        limit: Maximum number of notes to return (None for all)
+        before: Cursor - a note id (the previous page's next_cursor) or an
+            ISO timestamp; only older notes are returned
+        fields: Field names to include (default: all of NOTE_FIELDS)
+        note_type: Only return notes of this type ('youtube' or 'meet')
+
+    Returns:
+        Tuple of (notes, next_cursor); next_cursor is None on the last page
+    """
+    fields = tuple(fields) if fields else NOTE_FIELDS
+    unknown = [field for field in fields if field not in NOTE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown note fields: {', '.join(unknown)}")
+
+    conn = get_connection()
+    _refresh_index(conn)
+    with _index_lock:
+        by_id = _index['by_id']
+        order = _index['by_type'].get(note_type, []) if note_type else _index['order']
+        if before is None:
+            end = len(order)
+        elif before in by_id:
+            end = bisect.bisect_left(order, (by_id[before]['timestamp'], _index['seq'][before], before))
+        elif CURSOR_TIMESTAMP_RE.fullmatch(before):
+            end = bisect.bisect_left(order, (before,))
+        else:
+            raise ValueError(f"Invalid cursor: {before!r} is neither a note id nor an ISO timestamp")
+
+        page = []
+        has_more = False
+        for i in range(end - 1, -1, -1):
+            header = by_id[order[i][2]]
+            if limit is not None and len(page) >= limit:
+                has_more = True
+                break
+            page.append(header)
+
+    # Bodies are only read for the notes on this page, and only if asked for
+    contents = _fetch_contents(conn, [header['id'] for header in page]) if 'content' in fields else {}
+    notes = [
+        {field: contents.get(header['id'], '') if field == 'content' else _header_value(header, field)
+         for field in fields}
+        for header in page
+    ]
+    next_cursor = page[-1]['id'] if has_more else None
+    return notes, next_cursor
+
 def get_all_notes():
-    """Get all notes"""
-    return load_notes()
+    """Get all notes, newest first"""
+    notes, _ = list_notes()
+    return notes
 
 def get_note_by_id(note_id):
     """Get a specific note by ID"""
-    notes = load_notes()
-    for note in notes:
-        if note['id'] == note_id:
-            return note
-    return None
+    conn = get_connection()
+    _refresh_index(conn)
+    with _index_lock:
+        header = _index['by_id'].get(note_id)
+    if header is None:
+        return None
+    row = conn.execute("SELECT content FROM notes WHERE id = ?", (note_id,)).fetchone()
+    if row is None:
+        return None
+    return dict(_public_header(header), content=decompress_content(row['content']))
 
+def _fts_query(words):
+    """Turn query words into an FTS5 query where every word must match"""
+    return ' '.join(f'"{word}"' for word in words)
+
+def _title_query(words):
+    """FTS5 query for notes with any of the query words in their title or video title"""
+    return '{title video_title} : (' + ' OR '.join(f'"{word}"' for word in words) + ')'
+
+def make_snippet(content, words, width=SNIPPET_WIDTH):
+    """Excerpt of content around the first query hit, with hits wrapped in [ ]"""
+    pattern = re.compile(r'\b(?:' + '|'.join(re.escape(word) for word in words) + r')\w*', re.IGNORECASE)
+    match = pattern.search(content)
+    start = max(0, match.start() - width // 3) if match else 0
+    excerpt = content[start:start + width]
+    # Don't cut words in half at either end
+    if start > 0:
+        excerpt = excerpt.split(None, 1)[-1]
+    if start + width < len(content):
+        excerpt = excerpt.rsplit(None, 1)[0]
+    excerpt = pattern.sub(lambda m: f'[{m.group(0)}]', ' '.join(excerpt.split()))
+    return ('...' if start > 0 else '') + excerpt + ('...' if start + width < len(content) else '')
+
+def _with_title_hits(conn, rank, match, words, floor, rows, limit):
+    """
+    Merge matches older than the rank window that have a query word in their
+    title or video title into the window's top rows; returns the new top rows
+
+    Candidates are found with the query narrowed to those columns, whose
+    bm25 adds the title terms a second time, so it is never worse than the
+    note's real score. Only candidates that could still beat the window's
+    worst kept row are scored again with the real query.
+    """
+    narrowed = conn.execute(
+        rank + "AND rowid < ? ORDER BY score LIMIT ?",
+        (f'({match}) AND {_title_query(words)}', floor, limit)
+    ).fetchall()
+    if len(rows) == limit:
+        narrowed = [row for row in narrowed if row['score'] < rows[-1]['score']]
+    if not narrowed:
+        return rows
+    placeholders = ', '.join('?' * len(narrowed))
+    rows = rows + conn.execute(
+        rank + f"AND rowid IN ({placeholders})", [match] + [row['rowid'] for row in narrowed]
+    ).fetchall()
+    return sorted(rows, key=lambda row: row['score'])[:limit]
+
+def search_notes(query, limit=20):
+    """
+    Full-text search over note titles, content and source names
+
+    Args:
+        query: Free-text search string; every word must match
+        limit: Maximum number of results
+
+    Returns:
+        List of note headers, best match first, each with a 'snippet'
+        of the matching content ([...] marks the hits) and a 'score'
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return []
+    match = _fts_query(words)
+
+    conn = get_connection()
+    _refresh_index(conn)
+    floor = conn.execute(
+        "SELECT rowid FROM notes_fts WHERE notes_fts MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+        (match, SEARCH_RANK_WINDOW - 1)
+    ).fetchone()
+
+    weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+    rank = f"SELECT rowid, bm25(notes_fts, {weights}) AS score FROM notes_fts WHERE notes_fts MATCH ? "
+    rows = conn.execute(rank + "AND rowid >= ? ORDER BY score LIMIT ?", (match, floor[0] if floor else 0, limit)).fetchall()
+    if floor:
+        rows = _with_title_hits(conn, rank, match, words, floor[0], rows, limit)
+    if not rows:
+        return []
+
+    # Snippets are cut in Python from just the top hits; FTS5's snippet()
+    # would be evaluated for every ranked match
+    placeholders = ', '.join('?' * len(rows))
+    bodies = {
+        row['seq']: (row['id'], row['content'])
+        for row in conn.execute(
+            f"SELECT seq, id, content FROM notes WHERE seq IN ({placeholders})",
+            [row['rowid'] for row in rows]
+        )
+    }
 
+    results = []
+    with _index_lock:
+        by_id = _index['by_id']
+        for row in rows:
+            note_id, content = bodies.get(row['rowid'], (None, ''))
+            header = by_id.get(note_id)
+            if header is None:
+                continue
+            # bm25() is negative, lower is better; flip it for the API
+            snippet = make_snippet(decompress_content(content), words)
+            results.append(dict(_public_header(header), snippet=snippet, score=round(-row['score'], 4)))
+    return results
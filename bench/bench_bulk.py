@@ -0,0 +1,88 @@
+"""
+Bulk YouTube note throughput (videos/minute) for 1, 4 and 16 workers,
+through the Flask test client and the job queue.
+
+    python bench/bench_bulk.py [--videos 32] [--failing 2]
+
+There is no YouTube access here: yt-dlp metadata (0.6-1.2s) and caption
+downloads (0.3-0.8s) are simulated with sleeps, and the caches are
+bypassed, so the numbers measure how well the pool overlaps that latency.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+os.environ.setdefault('GEMINI_API_KEY', 'bench-key')
+
+from corpus import make_transcript
+
+WORKER_COUNTS = (1, 4, 16)
+
+def simulate_youtube(youtube_service, transcript):
+    """Replace the network-bound steps of the pipeline with sleeps"""
+    rnd = random.Random(1)
+    lock = youtube_service.threading.Lock()
+
+    def latency(low, high):
+        with lock:
+            return rnd.uniform(low, high)
+
+    def fetch_video_info(video_id):
+        time.sleep(latency(0.6, 1.2))
+        return None if video_id.startswith('bad') else {'title': video_id}
+
+    def get_video_cues(video_id, info=None):
+        if info is None:
+            raise Exception("Could not fetch transcript.")
+        time.sleep(latency(0.3, 0.8))
+        return [(None, None, transcript)]
+
+    youtube_service.fetch_video_info = fetch_video_info
+    youtube_service.get_video_info = lambda video_id, info=None: (video_id, 600, '')
+    youtube_service.get_video_cues = get_video_cues
+    for cache in (youtube_service.transcript_cache, youtube_service.notes_cache):
+        cache.get = lambda key: None
+        cache.set = lambda key, value, ttl=None: None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--videos', type=int, default=32)
+    parser.add_argument('--failing', type=int, default=2, help='how many of the videos have no captions')
+    args = parser.parse_args()
+
+    data_dir = os.environ['NOTEGEN_DATA_DIR'] = tempfile.mkdtemp(prefix='notegen-bench-')
+    try:
+        run(args)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+def run(args):
+    import app
+    import youtube_service
+
+    simulate_youtube(youtube_service, make_transcript(20_000))
+    client = app.app.test_client()
+    for workers in WORKER_COUNTS:
+        urls = [f"https://www.youtube.com/watch?v=w{workers:02d}v{i:05d}" for i in range(args.videos - args.failing)]
+        urls += [f"https://youtu.be/bad{workers}x{i}" for i in range(args.failing)]
+        response = client.post('/api/generate-notes/youtube/bulk', json={'urls': urls, 'workers': workers})
+        job_id = response.get_json()['job_id']
+        while True:
+            job = client.get(f'/api/jobs/{job_id}').get_json()['job']
+            if job['status'] in ('done', 'failed'):
+                break
+            time.sleep(0.1)
+        if job['status'] == 'failed':
+            print(f"{workers:>2} workers: job failed: {job['error']}")
+            continue
+        summary = job['result']['summary']
+        print(f"{workers:>2} workers: {summary['succeeded']}/{summary['total']} videos in "
+              f"{summary['seconds']:5.1f}s  {summary['videos_per_minute']:6.1f} videos/min")
+
+if __name__ == '__main__':
+    main()
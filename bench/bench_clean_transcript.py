@@ -0,0 +1,58 @@
+"""
+Time clean_transcript against the original per-pattern implementation on
+100k and 1M word transcripts, and check both give the same text.
+
+    python bench/bench_clean_transcript.py
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+os.environ.setdefault('GEMINI_API_KEY', 'bench-key')
+
+from corpus import make_transcript
+from youtube_service import clean_transcript
+
+# The implementation clean_transcript replaced, kept verbatim as the baseline
+BASELINE_PATTERNS = [
+    r'\b(um|uh|like|you know|actually|basically|literally|sort of|kind of|i mean|okay|so|right|well|hmm|ah|er|umm|uhh|guys|yaar|dude|bro|hey|hello|hi|welcome back|folks)\b',
+    r'\b(subscribe|like the video|hit the bell|notification|channel|please share|comment below|don\'t forget to|smash that|ring the bell|hit that like button)\b.*?\.',
+    r'\[.*?\]',
+    r'\(.*?\)',
+    r'♪.*?♪',
+    r'^\s*[0-9]+\s*$',
+]
+
+def baseline_clean_transcript(transcript):
+    if not transcript:
+        return ""
+    transcript = re.sub(r'\s+', ' ', transcript)
+    for pattern in BASELINE_PATTERNS:
+        transcript = re.sub(pattern, '', transcript, flags=re.IGNORECASE)
+    transcript = re.sub(r'\b(\w+)\s+\1\b', r'\1', transcript, flags=re.IGNORECASE)
+    transcript = re.sub(r'\.\s+\.', '.', transcript)
+    transcript = re.sub(r'\s+([.,!?;:])', r'\1', transcript)
+    transcript = re.sub(r'\.([A-Z])', r'. \1', transcript)
+    transcript = re.sub(r'!([A-Z])', r'! \1', transcript)
+    transcript = re.sub(r'\?([A-Z])', r'? \1', transcript)
+    return transcript.strip()
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    for n_words in (100_000, 1_000_000):
+        for punctuated in (True, False):
+            text = make_transcript(n_words, punctuated=punctuated)
+            cleaned, new_time = timed(clean_transcript, text)
+            label = f"{n_words:>9,} words {'punctuated' if punctuated else 'captions  '}"
+            expected, old_time = timed(baseline_clean_transcript, text)
+            print(f"{label}: new {new_time:6.2f}s  baseline {old_time:6.2f}s  "
+                  f"speedup {old_time / new_time:5.1f}x  identical={cleaned == expected}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Insert latency of add_note as the store grows from 100 to 100k notes.
+Each insert used to rewrite the whole of notes.json, so it grew with the
+store; in SQLite it should stay flat.
+
+    python bench/bench_insert.py [--max-notes 100000] [--samples 100]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from corpus import make_note, vocabulary, zipf_weights
+
+STORE_SIZES = (100, 1_000, 10_000, 100_000)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--max-notes', type=int, default=STORE_SIZES[-1])
+    parser.add_argument('--samples', type=int, default=100, help='timed inserts per store size')
+    args = parser.parse_args()
+
+    data_dir = os.environ['NOTEGEN_DATA_DIR'] = tempfile.mkdtemp(prefix='notegen-bench-')
+    try:
+        run(args)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+def run(args):
+    import storage
+
+    rnd = random.Random(1)
+    vocab = vocabulary()
+    weights = zipf_weights(len(vocab))
+    notes = [make_note(rnd, vocab, weights) for _ in range(64)]
+
+    count = 0
+    for size in (size for size in STORE_SIZES if size <= args.max_notes):
+        # Fill up to the next size untimed, then time the last inserts to it
+        batch = min(args.samples, size)
+        while count < size - batch:
+            storage.add_note('youtube', *notes[count % len(notes)])
+            count += 1
+        timings = []
+        for _ in range(batch):
+            start = time.perf_counter()
+            storage.add_note('youtube', *notes[count % len(notes)])
+            timings.append(time.perf_counter() - start)
+            count += 1
+        timings.sort()
+        print(f"{count:>7,} notes: median {timings[len(timings) // 2] * 1000:6.2f}ms  "
+              f"p95 {timings[int(len(timings) * 0.95)] * 1000:6.2f}ms")
+
+if __name__ == '__main__':
+    main()
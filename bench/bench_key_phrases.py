@@ -0,0 +1,73 @@
+"""
+Time extract_key_phrases against the original sentence-scanning
+implementation on 100k and 1M word transcripts, and check both pick the
+same phrases.
+
+    python bench/bench_key_phrases.py
+
+The worst case puts the most frequent words only in long sentences at the
+end, after tens of thousands of short ones, so the baseline's substring
+scan has to pass over all of them for every word.
+"""
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+os.environ.setdefault('GEMINI_API_KEY', 'bench-key')
+
+from corpus import make_transcript, vocabulary
+from youtube_service import STOP_WORDS, TranscriptAnalysis, extract_key_phrases
+
+NUM_PHRASES = 8
+
+# The implementation extract_key_phrases replaced, kept verbatim as the baseline
+def baseline_extract_key_phrases(text, num_phrases=10):
+    if not text:
+        return []
+    words = re.findall(r'\b[a-zA-Z]{4,}\b', text.lower())
+    filtered_words = [word for word in words if word not in STOP_WORDS]
+    if not filtered_words:
+        return []
+    word_freq = Counter(filtered_words)
+    common_words = [word for word, freq in word_freq.most_common(num_phrases * 2)]
+    sentences = re.split(r'[.!?]+', text)
+    key_phrases = []
+    for word in common_words[:num_phrases]:
+        for sentence in sentences:
+            if word in sentence.lower():
+                clean_sentence = ' '.join(sentence.split()[:15])
+                if clean_sentence and len(clean_sentence) > 20 and clean_sentence not in key_phrases:
+                    key_phrases.append(clean_sentence)
+                    break
+    return key_phrases[:num_phrases]
+
+def worst_case(n_words):
+    rnd = random.Random(1)
+    vocab = vocabulary()
+    short = '. '.join(' '.join(rnd.choice(vocab) for _ in range(2)) for _ in range(n_words // 4))
+    tail = '. '.join('zebra quokka narwhal axolotl alpha beta gamma delta epsilon' for _ in range(n_words // 200))
+    return short + '. ' + tail + '.'
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    for n_words in (100_000, 1_000_000):
+        for label, text in (('lecture', make_transcript(n_words)), ('worst case', worst_case(n_words))):
+            # The pipeline builds the analysis once and shares it between
+            # extractors, so its cost is reported separately
+            analysis, analysis_time = timed(TranscriptAnalysis, text)
+            phrases, new_time = timed(extract_key_phrases, text, NUM_PHRASES, analysis)
+            expected, old_time = timed(baseline_extract_key_phrases, text, NUM_PHRASES)
+            print(f"{n_words:>9,} words {label:<10}: new {new_time * 1000:8.1f}ms "
+                  f"(+{analysis_time * 1000:.0f}ms shared analysis)  baseline {old_time * 1000:8.1f}ms  "
+                  f"identical={phrases == expected}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+search_notes latency on a 50k-note store: rare words, common-plus-rare
+pairs and near-ubiquitous words (the ones bm25 would score across the
+whole corpus without SEARCH_RANK_WINDOW).
+
+    python bench/bench_search.py [--notes 50000] [--data-dir DIR]
+
+Building the store takes a while; pass --data-dir to keep it between runs.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from corpus import make_note, vocabulary, zipf_weights
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--notes', type=int, default=50_000)
+    parser.add_argument('--data-dir', help='reuse (or build) the store here instead of a scratch directory')
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='notegen-bench-')
+    os.environ['NOTEGEN_DATA_DIR'] = os.path.abspath(data_dir)
+    try:
+        run(args)
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def run(args):
+    import storage
+
+    rnd = random.Random(1)
+    vocab = vocabulary()
+    weights = zipf_weights(len(vocab))
+
+    existing = len(storage.list_notes(fields=['id'])[0])
+    if existing < args.notes:
+        start = time.perf_counter()
+        for _ in range(args.notes - existing):
+            storage.add_note('youtube', *make_note(rnd, vocab, weights))
+        print(f"Built {args.notes:,} notes in {time.perf_counter() - start:.1f}s")
+
+    queries = {
+        'rare word': [rnd.choice(vocab[50:2000]) for _ in range(200)],
+        'common + rare': [f"{rnd.choice(vocab[:300])} {rnd.choice(vocab[300:3000])}" for _ in range(200)],
+        'ubiquitous word': [rnd.choice(vocab[:20]) for _ in range(20)],
+    }
+    storage.search_notes(queries['rare word'][0])  # load the index
+    for label, batch in queries.items():
+        timings = []
+        for query in batch:
+            start = time.perf_counter()
+            storage.search_notes(query)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        print(f"{label:>16} ({len(batch)} queries): median {percentile(timings, 0.5):7.2f}ms  "
+              f"p95 {percentile(timings, 0.95):7.2f}ms  max {timings[-1]:7.2f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Deterministic synthetic lecture transcripts for the benchmarks in bench/"""
+import random
+
+SYLLABLES = ['ba', 'co', 'de', 'fi', 'gu', 'ha', 'ke', 'lo', 'mi', 'nu', 'pa', 're', 'si', 'to', 'va', 'ze',
+             'ar', 'en', 'il', 'on', 'ul', 'st', 'tr', 'pl']
+FILLERS = ['um', 'uh', 'you know', 'basically', 'like', 'so', 'right', 'okay']
+NOISE = ['[Music]', '[Applause]', '(laughs)', '♪ la la ♪']
+# Phrases the note extractors look for, so they have something to find
+MARKERS = ['means', 'is defined as', 'refers to', 'for example', 'such as', 'including', 'first', 'second',
+           'next', 'then', 'finally', 'step 2', 'introduction', 'overview', 'history', 'method', 'approach',
+           'result', 'summary', 'benefit', 'limitation', 'Jan 5, 2020', '12/05/2021', '42', '3.14']
+
+def vocabulary(size=6000, seed=1):
+    """size distinct pseudo-words of 2-5 syllables"""
+    rnd = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 5))))
+    return sorted(words)
+
+def make_transcript(n_words, seed=5, punctuated=True):
+    """
+    A transcript of about n_words words: sentences of pseudo-words with
+    fillers, bracketed noise, repeated words and the extractors' marker
+    phrases mixed in. Unpunctuated output looks like auto-generated captions.
+    """
+    rnd = random.Random(seed)
+    vocab = vocabulary()
+    out = []
+    count = 0
+    while count < n_words:
+        k = rnd.randint(4, 28)
+        words = [rnd.choice(vocab) for _ in range(k)]
+        for _ in range(rnd.choice((0, 0, 1, 1, 2))):
+            words.insert(rnd.randrange(len(words) + 1), rnd.choice(MARKERS))
+        if rnd.random() < 0.3:
+            words.insert(rnd.randrange(len(words) + 1), rnd.choice(FILLERS))
+        if rnd.random() < 0.05:
+            words.insert(rnd.randrange(len(words) + 1), rnd.choice(NOISE))
+        if rnd.random() < 0.05:
+            i = rnd.randrange(len(words))
+            words.insert(i, words[i])
+        sentence = ' '.join(words)
+        if punctuated:
+            sentence = sentence[0].upper() + sentence[1:] + rnd.choice(('.', '.', '.', '?', '!', '...'))
+        out.append(sentence)
+        count += k
+    return ('\n' if not punctuated else ' ').join(out)
+
+def zipf_weights(size):
+    """Word weights falling off like natural-language word frequencies"""
+    return [1 / (rank + 1) for rank in range(size)]
+
+def make_note(rnd, vocab, weights):
+    """(title, content, metadata) shaped like a generated YouTube note"""
+    def words(n):
+        return ' '.join(rnd.choices(vocab, weights, k=n))
+    video_title = words(5)
+    content = (
+        "# 📝 VIDEO NOTES\n\n## 📋 EXECUTIVE SUMMARY\n\n" + words(80) +
+        "\n\n## 🔑 KEY PHRASES\n" + '\n'.join(f"{i}. {words(12)}." for i in range(1, 9)) +
+        "\n\n## CONTENT\n" + words(300)
+    )
+    return f"YouTube Video: {video_title}", content, {'video_title': video_title, 'url': 'https://youtu.be/bench'}
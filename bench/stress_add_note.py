@@ -0,0 +1,76 @@
+"""
+Hammer add_note from several processes at once, all starting on a store
+that still has a legacy notes.json to import, and check that no note is
+lost or imported twice.
+
+    python bench/stress_add_note.py [--procs 8] [--notes 200] [--data-dir DIR]
+
+Exits with status 1 if any note is missing.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+LEGACY_NOTES = 100
+
+def write_notes(worker, count):
+    """One worker process: add count notes, return their ids"""
+    import storage
+    return [
+        storage.add_note('youtube', f'Worker {worker} note {i}', '- point\n' * 200, {'worker': worker})['id']
+        for i in range(count)
+    ]
+
+def write_legacy_notes(data_dir):
+    notes = [
+        {'id': f'legacy-{i}', 'type': 'meet', 'timestamp': '2020-01-01T00:00:00',
+         'title': 'Legacy', 'content': 'legacy body', 'metadata': {}}
+        for i in range(LEGACY_NOTES)
+    ]
+    with open(os.path.join(data_dir, 'notes.json'), 'w') as f:
+        json.dump({'notes': notes}, f)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--procs', type=int, default=8)
+    parser.add_argument('--notes', type=int, default=200, help='notes added by each process')
+    parser.add_argument('--data-dir', help='an empty directory to use instead of a scratch one')
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='notegen-stress-')
+    os.makedirs(data_dir, exist_ok=True)
+    # Spawned workers inherit the environment, so they all open this store
+    os.environ['NOTEGEN_DATA_DIR'] = os.path.abspath(data_dir)
+    try:
+        sys.exit(run(args, data_dir))
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+def run(args, data_dir):
+    write_legacy_notes(data_dir)
+    start = time.perf_counter()
+    with multiprocessing.get_context('spawn').Pool(args.procs) as pool:
+        results = pool.starmap(write_notes, [(worker, args.notes) for worker in range(args.procs)])
+    elapsed = time.perf_counter() - start
+
+    import storage
+    written = {note_id for ids in results for note_id in ids}
+    stored = [note['id'] for note in storage.get_all_notes()]
+    legacy = [note_id for note_id in stored if note_id.startswith('legacy-')]
+    missing = written - set(stored)
+    print(f"{args.procs} processes wrote {len(written)} notes in {elapsed:.1f}s "
+          f"({len(written) / elapsed:.0f}/s); stored {len(stored)}, missing {len(missing)}, "
+          f"legacy imported {len(legacy)}/{LEGACY_NOTES}")
+    ok = not missing and len(stored) == len(set(stored)) == len(written) + LEGACY_NOTES
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    main()
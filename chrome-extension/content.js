@@ -150,18 +150,52 @@ async function startRecording() {
     }
 }
 
+// How often to ask the backend whether a notes job has finished
+const JOB_POLL_INTERVAL_MS = 2000;
+
+async function readJson(response) {
+    try {
+        return await response.json();
+    } catch {
+        throw new Error(`Server error ${response.status}`);
+    }
+}
+
+// Poll a background job until it finishes; resolves with its result
+async function waitForJob(jobId) {
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+        const response = await fetch(`http://localhost:5000/api/jobs/${jobId}`);
+        const data = await readJson(response);
+        if (!response.ok) {
+            throw new Error(data.error || 'Lost track of the notes job');
+        }
+        if (data.job.status === 'done') {
+            return data.job.result;
+        }
+        if (data.job.status === 'failed') {
+            throw new Error(data.job.error || 'Failed to generate notes');
+        }
+    }
+}
+
 async function uploadAudioToBackend(audioBlob, detailLevel, formatType) {
     try {
         chrome.runtime.sendMessage({ action: 'uploadStarted' });
 
-        const formData = new FormData();
-        formData.append('audio', audioBlob, `meet-recording-${Date.now()}.webm`);
-        formData.append('detail_level', detailLevel);
-        formData.append('format_type', formatType);
+        // The recording is sent as the raw request body so the backend can
+        // encode it while it uploads; the notes are generated in the background
+        const params = new URLSearchParams({
+            filename: `meet-recording-${Date.now()}.webm`,
+            detail_level: detailLevel,
+            format_type: formatType,
+            async: '1'
+        });
 
-        const response = await fetch('http://localhost:5000/api/generate-notes/audio', {
+        const response = await fetch(`http://localhost:5000/api/generate-notes/audio?${params}`, {
             method: 'POST',
-            body: formData
+            headers: { 'Content-Type': audioBlob.type || 'audio/webm' },
+            body: audioBlob
         });
 
         let data;
@@ -173,10 +207,11 @@ async function uploadAudioToBackend(audioBlob, detailLevel, formatType) {
         }
 
         if (response.ok && data.success) {
+            const note = data.job_id ? (await waitForJob(data.job_id)).note : data.note;
             chrome.runtime.sendMessage({
                 action: 'uploadComplete',
                 success: true,
-                note: data.note
+                note: note
             });
         } else {
             throw new Error(data.error || 'Failed to generate notes');
@@ -49,22 +49,71 @@ document.querySelectorAll('.radio-option').forEach(option => {
     });
 });
 
-// YouTube form submission
+// Loading message for each pipeline stage reported by the stream
+const STAGE_MESSAGES = {
+    cached: 'Loading saved notes...',
+    metadata: 'Fetching video details...',
+    transcript: 'Downloading captions...',
+    cleaning: 'Cleaning transcript...',
+    chapters: 'Analyzing chapters...',
+    analysis: 'Analyzing transcript...'
+};
+
+// Render markdown into the results panel
+function renderNotes(markdown) {
+    const notesContent = document.getElementById('notes-content');
+    if (typeof marked !== 'undefined') {
+        notesContent.innerHTML = marked.parse(markdown);
+    } else {
+        notesContent.textContent = markdown;
+    }
+}
+
+// Read a Server-Sent Events response body, calling onEvent(name, data) per message
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const message = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let event = 'message';
+            let data = '';
+            for (const line of message.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
+// YouTube form submission: notes are streamed and shown section by section
 document.getElementById('youtube-form').addEventListener('submit', async (e) => {
     e.preventDefault();
     
     const url = document.getElementById('youtube-url').value;
     const detailLevel = document.getElementById('detail-level').value;
     const formatType = document.querySelector('input[name="format_type"]:checked').value;
+    const loadingText = document.querySelector('#loading p');
     
     // Show loading, hide results and error
+    loadingText.textContent = 'Generating notes... This may take a moment.';
     document.getElementById('loading').style.display = 'block';
     document.getElementById('results').classList.remove('show');
     document.getElementById('error').style.display = 'none';
     document.getElementById('generate-btn').disabled = true;
     
     try {
-        const response = await fetch(`${API_BASE_URL}/generate-notes/youtube`, {
+        const response = await fetch(`${API_BASE_URL}/generate-notes/youtube/stream`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -76,26 +125,39 @@ document.getElementById('youtube-form').addEventListener('submit', async (e) =>
             })
         });
         
-        const data = await response.json();
+        if (!response.ok) {
+            const data = await response.json();
+            throw new Error(data.error || 'Failed to generate notes');
+        }
         
-        if (response.ok && data.success) {
-            // Show results - render markdown
-            const notesContent = document.getElementById('notes-content');
-            if (typeof marked !== 'undefined') {
-                notesContent.innerHTML = marked.parse(data.note.content);
-            } else {
-                notesContent.textContent = data.note.content;
-            }
-            document.getElementById('results').classList.add('show');
-            
-            // Reload history if on history tab
-            if (document.getElementById('history-tab').classList.contains('active')) {
-                loadHistory();
+        let markdown = '';
+        let saved = false;
+        let streamError = null;
+        await readEventStream(response, (event, data) => {
+            if (event === 'progress') {
+                loadingText.textContent = STAGE_MESSAGES[data.stage] || 'Generating notes...';
+            } else if (event === 'section') {
+                markdown += data.markdown;
+                renderNotes(markdown);
+                document.getElementById('results').classList.add('show');
+            } else if (event === 'note') {
+                saved = true;
+                renderNotes(data.note.content);
+            } else if (event === 'error') {
+                streamError = data.error;
             }
-        } else {
-            throw new Error(data.error || 'Failed to generate notes');
+        });
+        
+        if (streamError || !saved) {
+            throw new Error(streamError || 'Connection closed before the notes were finished');
+        }
+        
+        // Reload history if on history tab
+        if (document.getElementById('history-tab').classList.contains('active')) {
+            loadHistory();
         }
     } catch (error) {
+        document.getElementById('results').classList.remove('show');
         document.getElementById('error').textContent = `Error: ${error.message}`;
         document.getElementById('error').style.display = 'block';
     } finally {
@@ -104,14 +166,29 @@ document.getElementById('youtube-form').addEventListener('submit', async (e) =>
     }
 });
 
-// Load history
-async function loadHistory() {
+// History is fetched a page at a time, without note bodies
+const HISTORY_PAGE_SIZE = 30;
+const HISTORY_FIELDS = 'id,title,type,timestamp,preview';
+let historyCursor = null;
+
+// Load history (append=true fetches the next page)
+async function loadHistory(append = false) {
     try {
-        const response = await fetch(`${API_BASE_URL}/notes`);
+        const activeFilter = document.querySelector('.filter-btn.active')?.dataset.filter || 'all';
+        const params = new URLSearchParams({ limit: HISTORY_PAGE_SIZE, fields: HISTORY_FIELDS });
+        if (activeFilter !== 'all') {
+            params.set('type', activeFilter);
+        }
+        if (append && historyCursor) {
+            params.set('before', historyCursor);
+        }
+        
+        const response = await fetch(`${API_BASE_URL}/notes?${params}`);
         const data = await response.json();
         
         if (response.ok) {
-            displayHistory(data.notes || []);
+            historyCursor = data.next_cursor || null;
+            displayHistory(data.notes || [], append);
         } else {
             throw new Error(data.error || 'Failed to load history');
         }
@@ -123,23 +200,15 @@ async function loadHistory() {
 }
 
 // Display history list
-function displayHistory(notes) {
+function displayHistory(notes, append = false) {
     const historyList = document.getElementById('history-list');
     const emptyState = document.getElementById('empty-state');
     const noteDetail = document.getElementById('note-detail');
     
-    // Get active filter
-    const activeFilter = document.querySelector('.filter-btn.active')?.dataset.filter || 'all';
-    
-    // Filter notes
-    const filteredNotes = activeFilter === 'all' 
-        ? notes 
-        : notes.filter(note => note.type === activeFilter);
-    
     // Hide detail view
     noteDetail.classList.remove('show');
     
-    if (filteredNotes.length === 0) {
+    if (!append && notes.length === 0) {
         historyList.style.display = 'none';
         emptyState.style.display = 'block';
         return;
@@ -148,16 +217,29 @@ function displayHistory(notes) {
     historyList.style.display = 'grid';
     emptyState.style.display = 'none';
     
-    historyList.innerHTML = filteredNotes.map(note => `
+    const cards = notes.map(note => `
         <div class="note-card ${note.type}" onclick="showNoteDetail('${note.id}')">
             <div class="note-header">
                 <div class="note-title">${escapeHtml(note.title)}</div>
                 <span class="note-type ${note.type}">${note.type === 'youtube' ? 'YouTube' : 'Meet'}</span>
             </div>
             <div class="note-date">${formatDate(note.timestamp)}</div>
-            <div class="note-preview">${escapeHtml(note.content.substring(0, 200).replace(/#{1,6}\s+/g, '').replace(/\*\*/g, '').replace(/\*/g, ''))}...</div>
+            <div class="note-preview">${escapeHtml(note.preview || '')}...</div>
         </div>
     `).join('');
+    
+    document.getElementById('load-more-btn')?.remove();
+    if (append) {
+        historyList.insertAdjacentHTML('beforeend', cards);
+    } else {
+        historyList.innerHTML = cards;
+    }
+    
+    if (historyCursor) {
+        historyList.insertAdjacentHTML('beforeend',
+            '<button class="back-btn" id="load-more-btn">Load more</button>');
+        document.getElementById('load-more-btn').addEventListener('click', () => loadHistory(true));
+    }
 }
 
 // Show note detail
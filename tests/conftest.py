@@ -0,0 +1,17 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# backend/ is run as a script directory rather than a package
+sys.path.insert(0, BACKEND_DIR)
+# gemini_service builds its client at import; tests never reach the API
+os.environ.setdefault('GEMINI_API_KEY', 'test-key')
+# Every store the tests touch lives in a throwaway data directory
+if 'NOTEGEN_DATA_DIR' not in os.environ:
+    os.environ['NOTEGEN_DATA_DIR'] = tempfile.mkdtemp(prefix='notegen-tests-')
+    atexit.register(shutil.rmtree, os.environ['NOTEGEN_DATA_DIR'], ignore_errors=True)
@@ -0,0 +1,168 @@
+import gzip
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import youtube_service
+from conftest import BACKEND_DIR
+
+app_module = pytest.importorskip('app')
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def test_import_starts_no_background_services():
+    # A spawned chapter worker re-runs app.py as __mp_main__; that must not
+    # start a janitor thread or job queue of its own
+    code = (
+        "import runpy, threading\n"
+        "module = runpy.run_path('app.py', run_name='__mp_main__')\n"
+        "assert module['job_queue'] is None, 'job queue started'\n"
+        "assert 'upload-janitor' not in [t.name for t in threading.enumerate()], 'janitor started'\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, env=dict(os.environ),
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+
+
+def test_first_request_starts_background_services(client):
+    client.get('/api/notes?limit=1')
+    assert app_module.job_queue is not None
+    assert 'upload-janitor' in [thread.name for thread in threading.enumerate()]
+
+
+def test_bad_cursor_is_a_client_error(client):
+    response = client.get('/api/notes?limit=5&before=not-a-cursor')
+    assert response.status_code == 400
+    assert 'cursor' in response.get_json()['error']
+
+
+def wait_for_job(client, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f'/api/jobs/{job_id}').get_json()['job']
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.02)
+    raise AssertionError('bulk job did not finish')
+
+
+def test_bulk_runs_as_a_job_and_saves_each_note_as_it_finishes(client, monkeypatch):
+    release = threading.Event()
+
+    def fake_generate(url, detail_level, format_type):
+        video_id = url.rsplit('=', 1)[-1]
+        if video_id == 'slow':
+            assert release.wait(10)
+        if video_id == 'broken':
+            raise Exception('No transcript available.')
+        return f'# Notes for {video_id}\n\n' + 'text ' * 50, f'Video {video_id}', video_id
+
+    monkeypatch.setattr(youtube_service, 'generate_notes_from_youtube', fake_generate)
+    urls = [f'https://www.youtube.com/watch?v={video_id}' for video_id in ('fast', 'slow', 'broken', 'fast')]
+    response = client.post('/api/generate-notes/youtube/bulk', json={'urls': urls, 'workers': 3})
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+
+    # The fast video's note is saved while the slow one is still running
+    deadline = time.time() + 10
+    while True:
+        job = client.get(f'/api/jobs/{job_id}').get_json()['job']
+        progress = job.get('progress') or {}
+        if progress.get('finished') == 2:
+            break
+        assert time.time() < deadline, job
+        time.sleep(0.02)
+    assert job['status'] == 'running'
+    assert progress['total'] == 3
+    saved = next(video for video in progress['videos'] if video['status'] == 'ok')
+    assert app_module.get_note_by_id(saved['note_id'])['title'] == 'YouTube Video: Video fast'
+
+    release.set()
+    job = wait_for_job(client, job_id)
+    result = job['result']
+    assert job['status'] == 'done'
+    assert result['success'] is False
+    assert [video['status'] for video in result['videos']] == ['ok', 'ok', 'error']
+    assert result['summary']['succeeded'] == 2
+    assert all('notes' not in video for video in result['videos'])
+    assert job['progress']['finished'] == 3
+
+
+def test_bulk_validates_before_queueing(client):
+    assert client.post('/api/generate-notes/youtube/bulk', json={'urls': 'x'}).status_code == 400
+    assert client.post('/api/generate-notes/youtube/bulk', json={'urls': ['a'], 'workers': 0}).status_code == 400
+
+
+def test_note_list_answers_304_until_the_store_changes(client):
+    app_module.add_note('meet', 'ETag list note', 'body')
+    first = client.get('/api/notes?limit=3&fields=id,title')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and etag
+
+    cached = client.get('/api/notes?limit=3&fields=id,title', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.get_data() == b''
+    assert cached.headers['ETag'] == etag
+
+    # Another query of the same store has its own tag
+    assert client.get('/api/notes?limit=4&fields=id,title').headers['ETag'] != etag
+
+    app_module.add_note('meet', 'ETag list note 2', 'body')
+    fresh = client.get('/api/notes?limit=3&fields=id,title', headers={'If-None-Match': etag})
+    assert fresh.status_code == 200
+    assert fresh.headers['ETag'] != etag
+    assert fresh.get_json()['notes'][0]['title'] == 'ETag list note 2'
+
+
+def test_single_note_answers_304(client):
+    note = app_module.add_note('meet', 'ETag single note', 'body')
+    first = client.get(f"/api/notes/{note['id']}")
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and etag
+
+    cached = client.get(f"/api/notes/{note['id']}", headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.get_data() == b''
+    assert client.get(f"/api/notes/{note['id']}", headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_large_responses_are_gzipped_for_clients_that_accept_it(client):
+    note = app_module.add_note('meet', 'Gzip note', 'a long meeting transcript line\n' * 200)
+    url = f"/api/notes/{note['id']}"
+
+    plain = client.get(url)
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+
+    zipped = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert zipped.headers['Vary'] == 'Accept-Encoding'
+    assert len(zipped.get_data()) < len(plain.get_data())
+    assert gzip.decompress(zipped.get_data()) == plain.get_data()
+    # The gzipped representation has its own tag, and it validates too
+    assert zipped.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+    cached = client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': zipped.headers['ETag']})
+    assert cached.status_code == 304
+    assert cached.headers['ETag'] == zipped.headers['ETag']
+
+
+def test_small_responses_are_not_gzipped(client):
+    response = client.get('/api/health', headers={'Accept-Encoding': 'gzip'})
+    assert len(response.get_data()) < app_module.GZIP_MIN_SIZE
+    assert 'Content-Encoding' not in response.headers
+    assert 'Vary' not in response.headers
+
+
+def test_search_needs_a_query(client):
+    assert client.get('/api/notes/search').status_code == 400
+    response = client.get('/api/notes/search?q=%20%20')
+    assert response.status_code == 400
+    assert 'q' in response.get_json()['error']
@@ -0,0 +1,49 @@
+"""Where long recordings are cut into segments"""
+from audio_processor import SEGMENT_SECONDS, SEGMENT_SLACK, plan_segments
+
+
+def test_short_recording_is_one_segment():
+    duration = SEGMENT_SECONDS + SEGMENT_SLACK
+    assert plan_segments(duration, [(300, 301)]) == [(0.0, duration)]
+
+
+def test_cuts_at_middle_of_nearest_silence():
+    # Pauses centred at 550, 590 and 640 seconds; 590 is closest to 600
+    silences = [(549, 551), (589, 591), (639.5, 640.5)]
+    assert plan_segments(1000, silences) == [(0.0, 590.0), (590.0, 1000)]
+
+
+def test_cuts_at_ideal_point_without_silence_in_reach():
+    silences = [(100, 101), (800, 801)]
+    assert plan_segments(1000, silences) == [(0.0, 600.0), (600.0, 1000)]
+
+
+def test_each_cut_is_planned_from_the_previous_one():
+    silences = [(610, 612), (1215, 1217), (1800, 1802)]
+    segments = plan_segments(2500, silences)
+    assert segments == [(0.0, 611.0), (611.0, 1216.0), (1216.0, 1801.0), (1801.0, 2500)]
+
+
+def test_short_tail_stays_with_the_last_segment():
+    # 11.5 minutes after the last full segment is within the slack, so no
+    # sliver of a final segment is split off
+    duration = SEGMENT_SECONDS + SEGMENT_SECONDS + SEGMENT_SLACK - 30
+    segments = plan_segments(duration, [])
+    assert segments == [(0.0, float(SEGMENT_SECONDS)), (float(SEGMENT_SECONDS), duration)]
+
+
+def test_late_silence_can_leave_a_very_short_final_segment():
+    # The only pause sits 2 minutes past the ideal cut, leaving a final
+    # segment of just 10 seconds
+    duration = SEGMENT_SECONDS + SEGMENT_SLACK + 10
+    segments = plan_segments(duration, [(719, 721)])
+    assert segments == [(0.0, 720.0), (720.0, duration)]
+    assert segments[-1][1] - segments[-1][0] == 10
+
+
+def test_segments_cover_the_recording_without_gaps():
+    silences = [(i * 97.0, i * 97.0 + 1) for i in range(1, 60)]
+    segments = plan_segments(5800, silences)
+    assert segments[0][0] == 0.0 and segments[-1][1] == 5800
+    assert all(a[1] == b[0] for a, b in zip(segments, segments[1:]))
+    assert all(end > start for start, end in segments)
@@ -0,0 +1,111 @@
+"""Long videos: splitting cues into chapters and merging per-chapter results"""
+import youtube_service
+from youtube_service import CHAPTER_SECONDS, reduce_chapters, split_into_chapters
+
+
+def cue(start, text):
+    return (start, None if start is None else start + 5, text)
+
+
+def test_own_chapter_marks_are_used():
+    chapters = [
+        {'start_time': 0, 'title': 'Intro'},
+        {'start_time': 120, 'title': 'Setup'},
+        {'start_time': 900, 'title': 'Deep dive'},
+    ]
+    cues = [cue(0, 'a'), cue(60, 'b'), cue(120, 'c'), cue(899, 'd'), cue(900, 'e'), cue(2000, 'f')]
+    assert split_into_chapters(cues, chapters) == [
+        {'start': 0, 'title': 'Intro', 'text': 'a b'},
+        {'start': 120, 'title': 'Setup', 'text': 'c d'},
+        {'start': 900, 'title': 'Deep dive', 'text': 'e f'},
+    ]
+
+
+def test_cues_before_the_first_mark_join_the_first_chapter():
+    chapters = [{'start_time': 30, 'title': 'One'}, {'start_time': 600, 'title': 'Two'}]
+    cues = [cue(0, 'early'), cue(40, 'a'), cue(700, 'b')]
+    assert [(c['title'], c['text']) for c in split_into_chapters(cues, chapters)] == [('One', 'early a'), ('Two', 'b')]
+
+
+def test_a_single_chapter_mark_falls_back_to_windows():
+    cues = [cue(0, 'a'), cue(CHAPTER_SECONDS, 'b')]
+    chapters = split_into_chapters(cues, [{'start_time': 0, 'title': 'Only'}])
+    assert [(c['title'], c['text']) for c in chapters] == [('Part 1', 'a'), ('Part 2', 'b')]
+
+
+def test_windows_start_at_the_first_cue_past_each_boundary():
+    cues = [cue(0, 'a'), cue(590, 'b'), cue(605, 'c'), cue(1190, 'd'), cue(1300, 'e')]
+    assert split_into_chapters(cues) == [
+        {'start': 0, 'title': 'Part 1', 'text': 'a b'},
+        {'start': 605, 'title': 'Part 2', 'text': 'c d'},
+        {'start': 1300, 'title': 'Part 3', 'text': 'e'},
+    ]
+
+
+def test_untimed_cues_stay_in_the_current_chapter():
+    cues = [cue(None, 'first'), cue(0, 'a'), cue(700, 'b'), cue(None, 'c'), cue(None, 'd')]
+    assert [(c['start'], c['text']) for c in split_into_chapters(cues)] == [(0, 'first a'), (700, 'b c d')]
+
+    chapters = [{'start_time': 0, 'title': 'One'}, {'start_time': 600, 'title': 'Two'}]
+    assert [c['text'] for c in split_into_chapters(cues, chapters)] == ['first a', 'b c d']
+
+
+def chapter_result(name, **overrides):
+    result = {
+        'cleaned': f'{name} text.',
+        'summary': '',
+        'terms': [],
+        'word_counts': {},
+        'phrase_for': {},
+        'long_sentences': [],
+        'elements': {'numbers': [], 'dates': [], 'definitions': [], 'examples': [], 'steps': []},
+        'topics': {},
+    }
+    result.update(overrides)
+    return result
+
+
+def test_reduce_keeps_chapter_order():
+    results = [
+        chapter_result(
+            'one',
+            long_sentences=['first chapter opens with this sentence'],
+            elements={'numbers': ['3', '7'], 'dates': ['2020'], 'definitions': [], 'examples': ['ex one'], 'steps': []},
+            topics={'Conclusion': ['one wraps up here'], 'Method': ['one method sentence']},
+        ),
+        chapter_result(
+            'two',
+            long_sentences=['second chapter says this in the middle'],
+            elements={'numbers': ['7', '9'], 'dates': [], 'definitions': [], 'examples': ['ex two'], 'steps': []},
+            topics={'Other': ['two other sentence'], 'Method': ['two method sentence'], 'Introduction': ['two intro']},
+        ),
+    ]
+    summary, key_phrases, elements, organized = reduce_chapters(results, 4)
+
+    assert summary == 'first chapter opens with this sentence second chapter says this in the middle.'
+    assert elements['numbers'] == ['3', '7', '9']
+    assert elements['examples'] == ['ex one', 'ex two']
+    assert elements['dates'] == ['2020']
+    # Topics in the classifier's order, each with its sentences in chapter order
+    assert list(organized) == ['Introduction', 'Method', 'Conclusion', 'Other']
+    assert organized['Method'] == ['one method sentence', 'two method sentence']
+
+
+def test_reduce_key_phrases_follow_merged_word_counts():
+    results = [
+        chapter_result('one', word_counts={'alpha': 2, 'beta': 1}, phrase_for={'alpha': 'alpha in one', 'beta': 'beta in one'}),
+        chapter_result('two', word_counts={'beta': 5, 'gamma': 1}, phrase_for={'beta': 'beta in two', 'gamma': 'gamma in two'}),
+    ]
+    _, key_phrases, _, _ = reduce_chapters(results, 4, num_phrases=3)
+    # beta is most frequent overall; its phrase comes from the first chapter that has one
+    assert key_phrases == ['beta in one', 'alpha in one', 'gamma in two']
+
+
+def test_reduce_matches_a_single_pass_for_one_chapter():
+    text = ' '.join(
+        f"Sentence number {i} explains the method and the results of the study in detail." for i in range(12)
+    )
+    merged = reduce_chapters([youtube_service.analyze_chapter(text)], 4)
+    cleaned = youtube_service.clean_transcript(text)
+    assert merged[0] == youtube_service.generate_summary(cleaned, 4)
+    assert merged[3] == youtube_service.organize_content_by_topic(cleaned)
@@ -0,0 +1,40 @@
+"""
+Golden-file equivalence tests for clean_transcript. The expected outputs were
+produced by the original per-line regex implementation, so any change in
+behaviour from the single-pass rewrite shows up here as a diff.
+"""
+import json
+import os
+
+import pytest
+
+from conftest import FIXTURES_DIR
+from youtube_service import clean_transcript
+
+GOLDEN_DIR = os.path.join(FIXTURES_DIR, 'clean_transcript')
+GOLDEN_CASES = sorted(name[:-len('.expected.txt')] for name in os.listdir(GOLDEN_DIR)
+                      if name.endswith('.expected.txt'))
+
+
+def _read(name):
+    with open(os.path.join(GOLDEN_DIR, name), encoding='utf-8', newline='') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('case', GOLDEN_CASES)
+def test_matches_golden_output(case):
+    assert clean_transcript(_read(case + '.txt')) == _read(case + '.expected.txt')
+
+
+def test_matches_token_soup():
+    with open(os.path.join(GOLDEN_DIR, 'token_soup.json'), encoding='utf-8') as f:
+        cases = json.load(f)
+    mismatches = [text for text, expected in cases if clean_transcript(text) != expected]
+    assert not mismatches, f'{len(mismatches)} of {len(cases)} differ, first: {mismatches[0]!r}'
+
+
+def test_repeated_word_regex_compiles_everywhere():
+    # Possessive quantifiers only exist from Python 3.11; the pattern must not use them
+    from youtube_service import _REPEATED_WORD_RE
+    assert '++' not in _REPEATED_WORD_RE.pattern
+    assert _REPEATED_WORD_RE.sub(r'\1', 'the the cat') == 'the cat'
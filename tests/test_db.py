@@ -0,0 +1,30 @@
+import os
+import threading
+
+import db
+
+
+def test_one_connection_per_thread_and_path(tmp_path):
+    first, second = str(tmp_path / 'a.db'), str(tmp_path / 'b.db')
+    conn = db.connect(first, 'CREATE TABLE IF NOT EXISTS t (x);')
+    assert db.connect(first) is conn
+    assert db.connect(second) is not conn
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(db.connect(first)))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+
+def test_new_connection_is_wal_with_schema_and_setup(tmp_path):
+    seen = []
+    conn = db.connect(str(tmp_path / 'sub' / 'c.db'), 'CREATE TABLE t (x);', setup=seen.append)
+    assert seen == [conn]
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchone()['name'] == 't'
+
+
+def test_data_dir_follows_environment():
+    assert db.DATA_DIR == os.environ['NOTEGEN_DATA_DIR']
+    assert db.data_path('notes.db') == os.path.join(os.environ['NOTEGEN_DATA_DIR'], 'notes.db')
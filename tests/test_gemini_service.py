@@ -0,0 +1,243 @@
+"""Audio notes against a stub Gemini client: segmented recordings, upload reuse and caching"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+import gemini_service
+
+
+class StubGemini:
+    """
+    Stand-in for genai.Client: files.upload/get and models.generate_content,
+    counting calls and the peak number of concurrent generate calls
+    """
+
+    def __init__(self, delay=0.05, fail_merge=False, upload_delay=0, expires_in=timedelta(hours=48)):
+        self.delay = delay
+        self.upload_delay = upload_delay
+        self.expires_in = expires_in
+        self.fail_merge = fail_merge
+        self.uploads = []
+        self.gets = []
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self.stored = {}
+        self._lock = threading.Lock()
+        self.files = SimpleNamespace(upload=self._upload, get=self._get)
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+
+    def _upload(self, file):
+        time.sleep(self.upload_delay)
+        with self._lock:
+            self.uploads.append(file)
+            name = f"files/{len(self.uploads)}"
+            uploaded = SimpleNamespace(
+                name=name,
+                path=file,
+                state=SimpleNamespace(name='ACTIVE'),
+                expiration_time=datetime.now(timezone.utc) + self.expires_in,
+            )
+            self.stored[name] = uploaded
+        return uploaded
+
+    def _get(self, name):
+        with self._lock:
+            self.gets.append(name)
+            if name not in self.stored:
+                raise Exception(f"404 {name} not found")
+            return self.stored[name]
+
+    def _generate_content(self, model, contents):
+        with self._lock:
+            self.calls.append(contents)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            if len(contents) == 1:
+                if self.fail_merge:
+                    raise Exception("503 model overloaded")
+                return SimpleNamespace(text=' merged notes ')
+            with open(contents[1].path) as f:
+                return SimpleNamespace(text=f"notes on {f.read()}")
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def write_recording(directory, name, contents):
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(contents)
+    return path
+
+
+@pytest.fixture
+def segmented(tmp_path, monkeypatch):
+    """A recording that split_audio cuts into 6 segments, 10 minutes apart (no ffmpeg needed)"""
+    tag = uuid4().hex
+    recording = write_recording(tmp_path, 'recording.mp3', f"whole {tag}")
+    starts = [i * 600.0 for i in range(6)]
+
+    def fake_split(filepath, output_dir):
+        return [
+            (start, write_recording(output_dir, f"segment-{i:03d}.mp3", f"segment {i} {tag}"))
+            for i, start in enumerate(starts)
+        ]
+
+    monkeypatch.setattr(gemini_service, 'split_audio', fake_split)
+    return recording, tag
+
+
+def segment_calls(stub):
+    return [contents for contents in stub.calls if len(contents) == 2]
+
+
+def test_segments_carry_their_cut_points(segmented):
+    recording, tag = segmented
+    stub = StubGemini(delay=0)
+    gemini_service.generate_notes_from_audio(recording, gemini_client=stub)
+
+    prompts = sorted(prompt for prompt, _ in segment_calls(stub))
+    assert len(prompts) == 6
+    assert 'part 1 of 6 of one meeting recording (0:00-10:00)' in prompts[0]
+    assert 'part 5 of 6 of one meeting recording (40:00-50:00)' in prompts[4]
+    assert 'part 6 of 6 of one meeting recording (50:00 to the end)' in prompts[5]
+
+
+def test_at_most_four_segments_in_flight(segmented):
+    recording, tag = segmented
+    stub = StubGemini(delay=0.1)
+    gemini_service.generate_notes_from_audio(recording, gemini_client=stub)
+
+    assert len(stub.uploads) == 6
+    assert stub.peak == gemini_service.AUDIO_SEGMENT_WORKERS == 4
+
+
+def test_merge_sees_parts_in_recording_order(segmented):
+    recording, tag = segmented
+    stub = StubGemini(delay=0)
+    notes = gemini_service.generate_notes_from_audio(recording, gemini_client=stub)
+
+    assert notes == 'merged notes'
+    merge_prompt = stub.calls[-1][0]
+    positions = [merge_prompt.index(f"### Part {i + 1} (from {i * 10}:00)\n\nnotes on segment {i} {tag}") for i in range(6)]
+    assert positions == sorted(positions)
+
+
+def test_failed_merge_returns_parts_in_order_and_is_not_cached(segmented):
+    recording, tag = segmented
+    stub = StubGemini(delay=0, fail_merge=True)
+    notes = gemini_service.generate_notes_from_audio(recording, gemini_client=stub)
+
+    assert notes.startswith(f"### Part 1 (from 0:00)\n\nnotes on segment 0 {tag}")
+    assert notes.index('### Part 2') < notes.index('### Part 6 (from 50:00)')
+
+    # The next attempt only redoes the merge: segment notes were cached
+    retry = StubGemini(delay=0)
+    assert gemini_service.generate_notes_from_audio(recording, gemini_client=retry) == 'merged notes'
+    assert retry.uploads == []
+    assert len(retry.calls) == 1
+
+
+@pytest.fixture
+def recording(tmp_path, monkeypatch):
+    """A short recording, sent to Gemini whole"""
+    monkeypatch.setattr(gemini_service, 'split_audio', lambda filepath, output_dir: [(0, filepath)])
+    return write_recording(tmp_path, 'recording.mp3', f"meeting {uuid4().hex}")
+
+
+def test_resubmitted_recording_costs_nothing(recording):
+    first = StubGemini(delay=0)
+    notes = gemini_service.generate_notes_from_audio(recording, 'medium', 'bullet', gemini_client=first)
+    assert len(first.uploads) == 1 and len(first.calls) == 1
+
+    again = StubGemini(delay=0)
+    assert gemini_service.generate_notes_from_audio(recording, 'medium', 'bullet', gemini_client=again) == notes
+    assert (again.uploads, again.gets, again.calls) == ([], [], [])
+
+
+def test_new_options_reuse_the_uploaded_file(recording):
+    stub = StubGemini(delay=0)
+    gemini_service.generate_notes_from_audio(recording, 'medium', 'bullet', gemini_client=stub)
+    gemini_service.generate_notes_from_audio(recording, 'detailed', 'bullet', gemini_client=stub)
+
+    assert len(stub.uploads) == 1
+    assert stub.gets == ['files/1']
+    assert len(stub.calls) == 2
+    assert stub.calls[1][1] is stub.stored['files/1']
+
+
+def test_file_gone_from_gemini_is_uploaded_again(recording):
+    stub = StubGemini(delay=0)
+    gemini_service.generate_notes_from_audio(recording, 'medium', 'bullet', gemini_client=stub)
+    # Gemini deleted the file early, e.g. it was removed by hand
+    stub.stored.clear()
+    gemini_service.generate_notes_from_audio(recording, 'brief', 'bullet', gemini_client=stub)
+
+    assert len(stub.uploads) == 2
+    assert stub.gets == ['files/1']
+
+    # The new upload is registered in place of the missing one
+    gemini_service.generate_notes_from_audio(recording, 'detailed', 'bullet', gemini_client=stub)
+    assert len(stub.uploads) == 2
+    assert stub.gets == ['files/1', 'files/2']
+
+
+def test_file_about_to_expire_is_not_reused(recording):
+    # Gemini expires this upload inside UPLOAD_EXPIRY_MARGIN, so it is never registered
+    stub = StubGemini(delay=0, expires_in=timedelta(seconds=gemini_service.UPLOAD_EXPIRY_MARGIN - 60))
+    gemini_service.generate_notes_from_audio(recording, 'medium', 'bullet', gemini_client=stub)
+    gemini_service.generate_notes_from_audio(recording, 'brief', 'bullet', gemini_client=stub)
+
+    assert len(stub.uploads) == 2
+    assert stub.gets == []
+
+
+def test_concurrent_submissions_share_one_upload(recording):
+    stub = StubGemini(delay=0.1, upload_delay=0.2)
+    options = [('brief', 'bullet'), ('medium', 'bullet'), ('detailed', 'bullet'), ('brief', 'paragraph'), ('medium', 'paragraph')]
+    start = threading.Barrier(len(options))
+    results = {}
+
+    def submit(detail_level, format_type):
+        start.wait()
+        results[detail_level, format_type] = gemini_service.generate_notes_from_audio(
+            recording, detail_level, format_type, gemini_client=stub
+        )
+
+    threads = [threading.Thread(target=submit, args=option) for option in options]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(results) == 5
+    assert len(stub.uploads) == 1
+    assert len(stub.calls) == 5
+
+
+def test_concurrent_identical_submissions_share_one_call(recording):
+    stub = StubGemini(delay=0.2)
+    start = threading.Barrier(5)
+    results = []
+
+    def submit():
+        start.wait()
+        results.append(gemini_service.generate_notes_from_audio(recording, 'medium', 'bullet', gemini_client=stub))
+
+    threads = [threading.Thread(target=submit) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(results) == 5 and len(set(results)) == 1
+    assert len(stub.uploads) == 1
+    assert len(stub.calls) == 1
@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+
+import jobs
+
+
+@pytest.fixture
+def queue():
+    return jobs.JobQueue(workers=2)
+
+
+def wait_for(queue, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f'job {job_id} still {job["status"]}')
+
+
+def insert_job(job_id, owner, heartbeat_age, status='running'):
+    now = time.time()
+    conn = jobs.get_connection()
+    with conn:
+        conn.execute(
+            "INSERT INTO jobs (id, kind, status, owner, heartbeat_at, created_at) VALUES (?, 'test', ?, ?, ?, ?)",
+            (job_id, status, owner, now - heartbeat_age, now - heartbeat_age)
+        )
+
+
+def test_submit_runs_job_and_stores_result(queue):
+    job_id = queue.submit('test', lambda a, b=0: {'sum': a + b}, 2, b=3)
+    job = wait_for(queue, job_id)
+    assert job['status'] == 'done'
+    assert job['result'] == {'sum': 5}
+    assert job['kind'] == 'test'
+    assert job['created_at'] <= job['started_at'] <= job['finished_at']
+
+
+def test_failing_job_reports_error(queue):
+    def boom():
+        raise RuntimeError('Gemini said no')
+    job = wait_for(queue, queue.submit('test', boom))
+    assert job['status'] == 'failed'
+    assert job['error'] == 'Gemini said no'
+    assert 'result' not in job
+
+
+def test_job_is_queued_then_running(queue):
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return {}
+
+    running = [queue.submit('test', slow) for _ in range(2)]
+    queued = queue.submit('test', slow)
+    assert started.wait(5)
+    assert queue.get(queued)['status'] == 'queued'
+    release.set()
+    assert wait_for(queue, queued)['status'] == 'done'
+    assert all(wait_for(queue, job_id)['status'] == 'done' for job_id in running)
+
+
+def test_unknown_job(queue):
+    assert queue.get('no-such-job') is None
+
+
+def test_job_of_a_dead_queue_fails(queue):
+    insert_job('orphan', owner='gone', heartbeat_age=jobs.JOB_HEARTBEAT_TIMEOUT + 5)
+    job = queue.get('orphan')
+    assert job['status'] == 'failed'
+    assert 'restarted' in job['error']
+
+
+def test_job_of_a_live_queue_keeps_running(queue):
+    # Another worker process's queue, still sending heartbeats
+    insert_job('elsewhere', owner='other-queue', heartbeat_age=1)
+    assert queue.get('elsewhere')['status'] == 'running'
+
+
+def test_own_jobs_are_never_orphaned(queue):
+    insert_job('mine', owner=queue.instance, heartbeat_age=jobs.JOB_HEARTBEAT_TIMEOUT + 5)
+    assert queue.get('mine')['status'] == 'running'
+
+
+def test_heartbeat_keeps_jobs_alive(queue, monkeypatch):
+    monkeypatch.setattr(jobs, 'JOB_HEARTBEAT_INTERVAL', 0.05)
+    release = threading.Event()
+    job_id = queue.submit('test', lambda: release.wait(5) and {})
+    conn = jobs.get_connection()
+    with conn:
+        conn.execute("UPDATE jobs SET heartbeat_at = 0 WHERE id = ?", (job_id,))
+    time.sleep(0.3)
+    heartbeat = conn.execute("SELECT heartbeat_at FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+    release.set()
+    assert heartbeat > time.time() - 5
+    wait_for(queue, job_id)
+
+
+def test_stats_counts_jobs_and_fails_orphans(queue):
+    before = queue.stats()
+    insert_job('stats-orphan', owner='gone', heartbeat_age=jobs.JOB_HEARTBEAT_TIMEOUT + 5, status='queued')
+    wait_for(queue, queue.submit('test', lambda: {}))
+    stats = queue.stats()
+    assert stats['workers'] == 2
+    assert stats['done'] == before['done'] + 1
+    assert stats['failed'] == before['failed'] + 1
+    assert stats['queued'] == before['queued']
+    assert stats['wait_seconds']['p50'] is not None
+    assert stats['run_seconds']['p95'] is not None
@@ -0,0 +1,207 @@
+import json
+import sqlite3
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+import storage
+
+
+def _add(title='Note', metadata=None):
+    return storage.add_note('youtube', title, f'# {title}\n\nSome body text about {title}.', metadata)
+
+
+def test_metadata_changes_do_not_leak_into_later_reads():
+    note = _add('Graphs lecture', {'video_title': 'Graphs', 'tags': ['cs']})
+
+    listed = next(n for n in storage.get_all_notes() if n['id'] == note['id'])
+    listed['metadata']['tags'].append('changed')
+    listed['metadata']['video_title'] = 'changed'
+
+    found = storage.get_note_by_id(note['id'])
+    assert found['metadata'] == {'video_title': 'Graphs', 'tags': ['cs']}
+    found['metadata'].clear()
+
+    hit = next(n for n in storage.search_notes('Graphs lecture') if n['id'] == note['id'])
+    assert hit['metadata'] == {'video_title': 'Graphs', 'tags': ['cs']}
+    hit['metadata']['tags'] = None
+
+    projected, _ = storage.list_notes(fields=['id', 'metadata'])
+    assert next(n for n in projected if n['id'] == note['id'])['metadata'] == {'video_title': 'Graphs', 'tags': ['cs']}
+
+
+def test_caller_metadata_is_not_shared_with_the_store():
+    metadata = {'video_title': 'Trees'}
+    note = _add('Trees lecture', metadata)
+    metadata['video_title'] = 'changed'
+    assert storage.get_note_by_id(note['id'])['metadata'] == {'video_title': 'Trees'}
+
+
+def test_cursor_pages_through_notes_in_order():
+    ids = [_add(f'Page note {i}')['id'] for i in range(5)]
+    seen = []
+    notes, cursor = storage.list_notes(limit=2, fields=['id'])
+    while True:
+        seen.extend(note['id'] for note in notes)
+        if cursor is None:
+            break
+        notes, cursor = storage.list_notes(limit=2, before=cursor, fields=['id'])
+    assert [note_id for note_id in seen if note_id in ids] == ids[::-1]
+    assert len(seen) == len(set(seen))
+
+
+def test_timestamp_cursor():
+    note = _add('Timestamp cursor')
+    older, _ = storage.list_notes(before=note['timestamp'], fields=['id', 'timestamp'])
+    assert note['id'] not in [n['id'] for n in older]
+    assert all(n['timestamp'] < note['timestamp'] for n in older)
+    assert storage.list_notes(before='2000-01-01', fields=['id']) == ([], None)
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', str(uuid4()), '2024-13', '9999'])
+def test_unknown_cursor_is_rejected(cursor):
+    _add('Cursor target')
+    with pytest.raises(ValueError):
+        storage.list_notes(limit=1, before=cursor)
+
+
+def _other_connection():
+    """A second connection to notes.db, standing in for another worker process"""
+    conn = sqlite3.connect(storage.NOTES_DB)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _insert_elsewhere(conn, title, note_type='youtube'):
+    note_id = str(uuid4())
+    with conn:
+        conn.execute(
+            "INSERT INTO notes (id, type, timestamp, title, content, metadata, preview) VALUES (?, ?, ?, ?, ?, '{}', '')",
+            (note_id, note_type, datetime.now().isoformat(), title, storage.compress_content('body'))
+        )
+    return note_id
+
+
+def test_index_picks_up_other_writers_incrementally():
+    _add('Before other writer')
+    storage.list_notes(limit=1)
+    by_id = storage._index['by_id']
+
+    other = _other_connection()
+    first = _insert_elsewhere(other, 'Written elsewhere')
+    mine = _add('Written here')['id']
+    second = _insert_elsewhere(other, 'Written elsewhere again')
+
+    notes, _ = storage.list_notes(limit=3, fields=['id'])
+    assert [note['id'] for note in notes] == [second, mine, first]
+    # Appended to the existing index rather than rebuilt from scratch
+    assert storage._index['by_id'] is by_id
+
+
+def test_index_rebuilds_after_update_or_delete():
+    note = _add('Old title')
+    other = _other_connection()
+    with other:
+        other.execute("UPDATE notes SET title = 'New title' WHERE id = ?", (note['id'],))
+    assert storage.get_note_by_id(note['id'])['title'] == 'New title'
+
+    with other:
+        other.execute("DELETE FROM notes WHERE id = ?", (note['id'],))
+    assert storage.get_note_by_id(note['id']) is None
+    assert note['id'] not in [n['id'] for n in storage.list_notes(fields=['id'])[0]]
+
+
+def test_type_filter_pages_only_that_type():
+    meets = [storage.add_note('meet', f'Meeting {i}', 'minutes', {})['id'] for i in range(3)]
+    _add('A video in between')
+    meets.append(_insert_elsewhere(_other_connection(), 'Meeting elsewhere', 'meet'))
+
+    page, cursor = storage.list_notes(limit=2, note_type='meet', fields=['id', 'type'])
+    assert [note['id'] for note in page] == meets[:1:-1]
+    rest, _ = storage.list_notes(limit=2, before=cursor, note_type='meet', fields=['id', 'type'])
+    assert [note['id'] for note in rest] == meets[1::-1]
+    assert {note['type'] for note in page + rest} == {'meet'}
+
+
+def test_legacy_json_notes_are_imported_once(tmp_path, monkeypatch):
+    notes_file = tmp_path / 'notes.json'
+    note_id = str(uuid4())
+    notes_file.write_text(json.dumps({'notes': [
+        {'id': note_id, 'type': 'meet', 'timestamp': datetime.now().isoformat(), 'title': 'Legacy', 'content': '# Body'},
+    ]}))
+    monkeypatch.setattr(storage, 'NOTES_FILE', str(notes_file))
+
+    assert storage.migrate_json_notes(storage.get_connection()) == 1
+    assert not notes_file.exists()
+    assert (tmp_path / 'notes.json.migrated').exists()
+    assert storage.get_note_by_id(note_id)['content'] == '# Body'
+
+
+@pytest.mark.parametrize('contents', ['{"notes": [{"id": "x", "title": "cut off', '[]', '{"notes": {}}'])
+def test_unreadable_legacy_json_is_left_in_place(tmp_path, monkeypatch, capsys, contents):
+    notes_file = tmp_path / 'notes.json'
+    notes_file.write_text(contents)
+    monkeypatch.setattr(storage, 'NOTES_FILE', str(notes_file))
+
+    assert storage.migrate_json_notes(storage.get_connection()) == 0
+    assert notes_file.read_text() == contents
+    assert not (tmp_path / 'notes.json.migrated').exists()
+    output = capsys.readouterr().out
+    assert 'ERROR' in output and 'Migrated' not in output
+
+
+def _word():
+    """A search term no other test's notes contain"""
+    return 'kw' + uuid4().hex[:10]
+
+
+def test_search_ranks_title_and_source_hits_above_body_hits():
+    word = _word()
+    body = storage.add_note('meet', 'Weekly sync', f'We talked about {word} for a while.')
+    source = storage.add_note('youtube', 'Lecture notes', 'Nothing relevant here.', {'video_title': f'All about {word}'})
+    title = storage.add_note('youtube', f'{word} explained', f'An introduction to {word}.')
+
+    results = storage.search_notes(word)
+    assert [note['id'] for note in results] == [title['id'], source['id'], body['id']]
+    assert results[0]['score'] > results[1]['score'] > results[2]['score'] > 0
+    assert 'content' not in results[0]
+
+
+def test_search_requires_every_word():
+    word, other = _word(), _word()
+    both = storage.add_note('meet', 'Both', f'{word} and {other} together.')
+    storage.add_note('meet', 'One', f'Only {word} here.')
+    assert [note['id'] for note in storage.search_notes(f'{word} {other}')] == [both['id']]
+    assert storage.search_notes('  ,;  ') == []
+
+
+def test_search_snippet_marks_hits_around_the_first_one():
+    word = _word()
+    content = 'Opening remarks. ' * 20 + f'Then {word} came up, and {word.upper()}s again. ' + 'Closing words. ' * 20
+    storage.add_note('meet', 'Snippets', content)
+
+    snippet = storage.search_notes(word)[0]['snippet']
+    assert snippet.startswith('...') and snippet.endswith('...')
+    assert f'Then [{word}] came up, and [{word.upper()}s] again.' in snippet
+    assert len(snippet) <= storage.SNIPPET_WIDTH + 6
+
+    short = storage.add_note('meet', 'Short', f'{word} only')
+    hit = next(note for note in storage.search_notes(word) if note['id'] == short['id'])
+    assert hit['snippet'] == f'[{word}] only'
+
+
+def test_old_title_hits_are_ranked_beyond_the_window(monkeypatch):
+    word = _word()
+    old = storage.add_note('youtube', f'{word} masterclass', 'The whole talk.')
+    newer = [storage.add_note('meet', f'Sync {i}', f'A passing mention of {word}.') for i in range(5)]
+
+    exact = storage.search_notes(word, limit=3)
+    assert exact[0]['id'] == old['id']
+
+    monkeypatch.setattr(storage, 'SEARCH_RANK_WINDOW', 2)
+    windowed = storage.search_notes(word, limit=3)
+    assert [note['score'] for note in windowed] == [note['score'] for note in exact]
+    assert windowed[0]['id'] == old['id']
+    # Body-only hits outside the window (the newest 2 matches) are not ranked
+    assert {note['id'] for note in windowed[1:]} == {note['id'] for note in newer[-2:]}
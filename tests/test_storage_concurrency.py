@@ -0,0 +1,17 @@
+import os
+import subprocess
+import sys
+
+from conftest import BACKEND_DIR
+
+STRESS_SCRIPT = os.path.join(os.path.dirname(BACKEND_DIR), 'bench', 'stress_add_note.py')
+
+
+def test_concurrent_writers_lose_no_notes(tmp_path):
+    # Worker processes race on the legacy import and then on every insert
+    result = subprocess.run(
+        [sys.executable, STRESS_SCRIPT, '--procs', '4', '--notes', '50', '--data-dir', str(tmp_path)],
+        capture_output=True, text=True, timeout=300
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert 'missing 0' in result.stdout
@@ -0,0 +1,102 @@
+"""Candidate subtitle tracks are raced per video, and losing downloads stop"""
+import threading
+import time
+
+import pytest
+
+import youtube_service
+
+TRACK = 'WEBVTT\n\n' + ''.join(
+    f'00:00:{i:02d}.000 --> 00:00:{i + 1:02d}.000\nline number {i} of a long enough caption track\n\n'
+    for i in range(20)
+)
+
+
+class FakeResponse:
+    def __init__(self, body, delay, log):
+        self.status_code = 200
+        self.encoding = 'utf-8'
+        self.body = body
+        self.delay = delay
+        self.log = log
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_content(self, chunk_size, decode_unicode):
+        for i in range(0, len(self.body), 64):
+            time.sleep(self.delay)
+            self.log.append(i)
+            yield self.body[i:i + 64]
+
+
+class FakeSession:
+    """Serves url -> (body, seconds per chunk), recording chunks sent per url"""
+
+    def __init__(self, tracks):
+        self.tracks = tracks
+        self.sent = {url: [] for url in tracks}
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, timeout, stream):
+        body, delay = self.tracks[url]
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        session = self
+
+        class Tracked(FakeResponse):
+            def __exit__(self, *exc):
+                with session._lock:
+                    session.active -= 1
+                return False
+
+        return Tracked(body, delay, self.sent[url])
+
+
+@pytest.fixture
+def fake_http(monkeypatch):
+    def install(tracks):
+        session = FakeSession(tracks)
+        monkeypatch.setattr(youtube_service, 'http', session)
+        monkeypatch.setattr(youtube_service, 'get_subtitle_candidates', lambda info: list(info))
+        return session
+    return install
+
+
+def test_most_preferred_passing_track_wins(fake_http):
+    fake_http({'bad': ('WEBVTT\n', 0), 'slow': (TRACK.replace('line', 'slow'), 0.002), 'fast': (TRACK, 0)})
+    cues, ok = youtube_service.get_transcript_direct('vid', info=['bad', 'slow', 'fast'])
+    assert ok
+    assert 'slow number 0' in cues[0][2]
+
+
+def test_losing_downloads_stop_once_a_track_is_picked(fake_http):
+    session = fake_http({'first': (TRACK, 0), 'loser': (TRACK * 50, 0.01)})
+    cues, ok = youtube_service.get_transcript_direct('vid', info=['first', 'loser'])
+    assert ok
+    time.sleep(0.1)
+    sent = len(session.sent['loser'])
+    time.sleep(0.1)
+    assert len(session.sent['loser']) == sent
+    assert sent < len(TRACK * 50) // 64
+
+
+def test_fetches_per_video_are_bounded(fake_http):
+    urls = [f'bad{i}' for i in range(youtube_service.MAX_SUBTITLE_CANDIDATES)]
+    session = fake_http({url: ('WEBVTT\n' + 'x' * 256, 0.005) for url in urls})
+    assert youtube_service.get_transcript_direct('vid', info=urls) == (None, False)
+    assert session.peak <= youtube_service.SUBTITLE_FETCHES_PER_VIDEO
+
+
+def test_cancelled_fetch_returns_nothing(fake_http):
+    fake_http({'track': (TRACK, 0)})
+    cancel = threading.Event()
+    cancel.set()
+    assert youtube_service.fetch_subtitle_track('track', cancel) is None
+    assert youtube_service.fetch_subtitle_track('track') is not None
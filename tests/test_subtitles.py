@@ -0,0 +1,75 @@
+"""Subtitle track parsing: each format, streamed in arbitrary chunks"""
+import json
+import os
+import random
+
+import pytest
+
+from conftest import FIXTURES_DIR
+from youtube_service import _iter_lines, iter_subtitle_cues, parse_subtitles
+
+SUBTITLE_DIR = os.path.join(FIXTURES_DIR, 'subtitles')
+
+AUTO_CAPTIONS = ['hey everyone welcome to the', 'lecture on data structures', 'today we cover trees & graphs']
+
+EXPECTED_TEXT = {
+    'auto_captions.vtt': AUTO_CAPTIONS + ["so so let's start"],
+    'auto_captions.json3': AUTO_CAPTIONS,
+    'manual.vtt': ['Hey everyone, welcome to the lecture.', 'Today we cover trees & graphs.',
+                   'Today we cover trees & graphs, and heaps.', 'Questions?'],
+    'manual.srt': ['Can we skip the proof?', 'No.', 'No.', 'No!',
+                   'The proof is the point. The proof is the point of the course.'],
+    'manual.json3': ['Is a tree a graph?', 'yes', 'yes', 'A connected graph with no cycles.'],
+}
+
+
+def _read(name):
+    with open(os.path.join(SUBTITLE_DIR, name), encoding='utf-8', newline='') as f:
+        return f.read()
+
+
+def _random_chunks(body, rnd):
+    cuts = sorted(rnd.sample(range(1, len(body)), min(len(body) - 1, rnd.randint(0, 40))))
+    return [body[i:j] for i, j in zip([0] + cuts, cuts + [len(body)])]
+
+
+@pytest.mark.parametrize('name', sorted(EXPECTED_TEXT))
+def test_cue_text(name):
+    cues = list(iter_subtitle_cues(_read(name).split('\n')))
+    assert [text for _, _, text in cues] == EXPECTED_TEXT[name]
+
+
+@pytest.mark.parametrize('name', sorted(EXPECTED_TEXT))
+@pytest.mark.parametrize('line_ending', ['\n', '\r\n'])
+def test_streamed_chunks_match_whole_body(name, line_ending):
+    body = _read(name)
+    expected = list(iter_subtitle_cues(body.split('\n')))
+    body = body.replace('\n', line_ending)
+    rnd = random.Random(name)
+    for _ in range(50):
+        assert list(iter_subtitle_cues(_iter_lines(_random_chunks(body, rnd)))) == expected
+
+
+def test_cue_times():
+    cues = list(iter_subtitle_cues(_read('manual.vtt').split('\n')))
+    assert [(start, end) for start, end, _ in cues] == [(0.0, 2.5), (2.5, 5.0), (5.0, 6.0), (65.0, 66.5)]
+
+
+def test_manual_track_keeps_repeated_speech():
+    # A one-line cue equal to the line before is only dropped once the
+    # track has shown it scrolls
+    assert parse_subtitles(_read('manual.srt')).count('No.') == 2
+
+
+def test_non_subtitle_text_is_kept():
+    assert parse_subtitles('just some text\nacross lines') == 'just some text across lines'
+
+
+def test_iter_lines_single_line_body_is_linear():
+    # A json3 track is one long line; every chunk used to re-copy all the
+    # text received so far
+    events = [{'tStartMs': i * 1000, 'dDurationMs': 1000, 'segs': [{'utf8': f'word{i}'}]} for i in range(20000)]
+    body = json.dumps({'events': events})
+    chunks = [body[i:i + 16] for i in range(0, len(body), 16)]
+    assert list(_iter_lines(chunks)) == [body]
+    assert len(list(iter_subtitle_cues(_iter_lines(chunks)))) == 20000
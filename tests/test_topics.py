@@ -0,0 +1,47 @@
+"""Sorting transcript sentences into topics"""
+from youtube_service import TopicClassifier, organize_content_by_topic, topic_classifier
+
+
+def test_keywords_match_whole_words_only():
+    assert topic_classifier.scores('the content of this talk') == {}
+    assert topic_classifier.scores('one con of this setup') == {'Disadvantages': 1}
+
+
+def test_multi_word_keyword():
+    assert topic_classifier.scores("let's wrap up for today") == {'Conclusion': 2}
+    # Its words on their own are not keywords
+    assert topic_classifier.scores('wrap the cable, then look up') == {}
+
+
+def test_suffixed_forms_count():
+    assert topic_classifier.scores('these results surprised us') == {'Results': 2}
+    assert topic_classifier.scores('we used it twice') == {'Application': 1}
+    assert topic_classifier.scores('starting with the basics') == {'Introduction': 1}
+
+
+def test_weights_add_up_per_topic():
+    assert topic_classifier.classify('the benefit of this approach and technique') == 'Method'
+
+
+def test_tie_goes_to_the_topic_listed_first():
+    # final (Conclusion 1) against previous (Background 1): Background is listed first
+    assert topic_classifier.classify('the final and previous versions') == 'Background'
+    classifier = TopicClassifier({'Beta': {'alpha': 1}, 'Alpha': {'omega': 1}})
+    assert classifier.classify('alpha and omega') == 'Beta'
+
+
+def test_custom_classifier():
+    classifier = TopicClassifier({
+        'Cooking': {'oven': 2, 'bake': 2, 'stir fry': 3},
+        'Cleaning': {'sponge': 2, 'scrub': 2},
+    })
+    text = (
+        "First you preheat the oven while the dough rests on the counter. "
+        "Then scrub the pan with a sponge before anything else happens. "
+        "Some people prefer to stir fry the vegetables on high heat instead. "
+        "Nothing in this sentence belongs to either of the two topics above."
+    )
+    organized = organize_content_by_topic(text, classifier=classifier)
+    assert list(organized) == ['Cooking', 'Cleaning', 'Other']
+    assert [len(sentences) for sentences in organized.values()] == [2, 1, 1]
+    assert organized['Cleaning'][0].startswith('Then scrub the pan')
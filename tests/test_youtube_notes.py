@@ -0,0 +1,105 @@
+"""Note generation for one video: request coalescing and streaming"""
+import threading
+import time
+
+import youtube_service
+
+
+def fake_pipeline(monkeypatch, release):
+    """Replace the pipeline with one that blocks on release; returns the list of runs"""
+    runs = []
+
+    def fake_iter(video_id, detail_level, format_type):
+        runs.append(video_id)
+        yield 'progress', 'metadata'
+        yield 'video', {'title': 'Slow video', 'duration': 60}
+        release.wait(5)
+        yield 'section', '# Slow video\n\n'
+        yield 'section', 'notes body\n'
+
+    monkeypatch.setattr(youtube_service, 'iter_youtube_notes', fake_iter)
+    return runs
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_stream_waits_for_identical_stream_in_flight(monkeypatch):
+    release = threading.Event()
+    runs = fake_pipeline(monkeypatch, release)
+    url = 'https://www.youtube.com/watch?v=stream00001'
+    events = {}
+
+    def consume(name):
+        events[name] = list(youtube_service.stream_notes_from_youtube(url, 'medium', 'bullet'))
+
+    leader = threading.Thread(target=consume, args=('leader',))
+    leader.start()
+    wait_until(lambda: youtube_service._in_flight.in_flight() == 1)
+    follower = threading.Thread(target=consume, args=('follower',))
+    follower.start()
+    time.sleep(0.1)
+    assert 'follower' not in events
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert runs == ['stream00001']
+    assert [kind for kind, _ in events['leader']] == ['progress', 'video', 'section', 'section', 'done']
+    assert events['follower'] == [
+        ('progress', 'waiting'),
+        ('progress', 'cached'),
+        ('video', {'title': 'Slow video'}),
+        ('section', '# Slow video\n\nnotes body\n'),
+        ('done', {'notes': '# Slow video\n\nnotes body\n', 'video_title': 'Slow video', 'video_id': 'stream00001'}),
+    ]
+    assert youtube_service._in_flight.in_flight() == 0
+
+
+def test_generate_waits_for_stream_in_flight(monkeypatch):
+    release = threading.Event()
+    runs = fake_pipeline(monkeypatch, release)
+    url = 'https://youtu.be/stream00002'
+    stream = youtube_service.stream_notes_from_youtube(url)
+    assert next(stream) == ('progress', 'metadata')
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(youtube_service.generate_notes_from_youtube(url)))
+    waiter.start()
+    release.set()
+    list(stream)
+    waiter.join(5)
+
+    assert runs == ['stream00002']
+    assert results == [('# Slow video\n\nnotes body\n', 'Slow video', 'stream00002')]
+
+
+def test_disconnected_stream_fails_its_waiters(monkeypatch):
+    release = threading.Event()
+    runs = fake_pipeline(monkeypatch, release)
+    url = 'https://youtu.be/stream00003'
+    stream = youtube_service.stream_notes_from_youtube(url)
+    next(stream)
+
+    events, errors = [], []
+
+    def wait():
+        try:
+            for event in youtube_service.stream_notes_from_youtube(url):
+                events.append(event)
+        except Exception as e:
+            errors.append(str(e))
+
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    wait_until(lambda: events == [('progress', 'waiting')])
+    stream.close()
+    waiter.join(5)
+
+    assert runs == ['stream00003']
+    assert errors and 'interrupted' in errors[0]
+    assert youtube_service._in_flight.in_flight() == 0